@@ -0,0 +1,46 @@
+"""
+Offline community detection and summary indexing.
+
+Clusters the entity graph with label propagation, writes a compact summary
+per community to Neo4j and indexes the summaries in ChromaDB, so global
+questions can be answered from a few summaries. By default only the
+communities touched by documents ingested or deleted since the last run are
+recomputed; --full rebuilds every community of the tenant.
+
+Usage (from backend/):
+
+    python -m app.build_communities
+    python -m app.build_communities --tenant-id acme
+    python -m app.build_communities --full
+"""
+import sys
+import json
+import argparse
+import logging
+
+from .utils.database import initialize_databases, close_databases
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or refresh community summaries for global questions")
+    parser.add_argument("--tenant-id", help="Tenant whose graph partition is clustered")
+    parser.add_argument("--full", action="store_true", help="Recompute every community instead of only touched ones")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    from .services.graph_rag_service import GraphRAGService
+
+    if not initialize_databases():
+        raise SystemExit("Could not initialize databases")
+    try:
+        stats = GraphRAGService().refresh_communities(tenant_id=args.tenant_id, full=args.full)
+    finally:
+        close_databases()
+
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Offline bulk loader that bypasses the HTTP layer.
+
+Streams documents from a JSONL file, a Parquet file or a directory of text
+files and ingests them through GraphRAGService in batches: embedding and
+spaCy entity extraction run in worker processes, while the parent process
+de-duplicates against ChromaDB and performs the bulk ChromaDB, BM25 and
+Neo4j writes. Progress is checkpointed after every written batch so an
+interrupted import can be resumed, and only a bounded number of batches is
+ever in flight, so memory use does not depend on input size.
+
+The API must be stopped while an import runs: both write the same BM25
+index, and the loader fails fast if the API holds its lock.
+
+Usage (from backend/):
+
+    python -m app.bulk_import corpus.jsonl --workers 4
+    python -m app.bulk_import corpus.parquet --content-field body --metadata-fields source year
+    python -m app.bulk_import ./docs --format text --tenant-id acme
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Tuple, Dict, Any, List, Optional
+
+from .utils.config import settings
+from .utils.database import initialize_databases, initialize_embedding_cache, close_databases
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = (".txt", ".md")
+
+# (content, metadata, byte offset just past the record; None for non-JSONL inputs)
+Document = Tuple[str, Dict[str, Any], Optional[int]]
+
+
+def _clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the scalar values ChromaDB accepts as metadata"""
+    return {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+
+
+def read_jsonl(path: str, content_field: str, metadata_fields: Optional[List[str]],
+               offset: int = 0) -> Iterator[Document]:
+    """Stream documents from a JSONL file, starting at a byte offset
+
+    Metadata comes from the record's "metadata" object, or from the named
+    top-level fields when metadata_fields is given.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if metadata_fields:
+                metadata = {field: record.get(field) for field in metadata_fields}
+            else:
+                metadata = record.get("metadata") or {}
+            yield record.get(content_field) or "", _clean_metadata(metadata), offset
+
+
+def read_parquet(path: str, content_field: str, metadata_fields: Optional[List[str]],
+                 batch_size: int) -> Iterator[Document]:
+    """Stream documents from a Parquet file one record batch at a time"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet requires pyarrow to be installed") from e
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [content_field, *metadata_fields] if metadata_fields else None
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        for record in batch.to_pylist():
+            content = record.pop(content_field, None) or ""
+            yield content, _clean_metadata(record), None
+
+
+def read_text_directory(path: str) -> Iterator[Document]:
+    """Stream documents from every text file under a directory, in a stable order"""
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(TEXT_EXTENSIONS):
+                continue
+            file_path = os.path.join(root, name)
+            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            yield content, {"source": os.path.relpath(file_path, path), "document_type": "text"}, None
+
+
+def open_reader(args, offset: Optional[int] = None) -> Iterator[Document]:
+    """Pick a reader from --format or the input's extension (offset only applies to JSONL)"""
+    input_format = args.format
+    if input_format is None:
+        if os.path.isdir(args.input):
+            input_format = "text"
+        elif args.input.endswith(".parquet"):
+            input_format = "parquet"
+        else:
+            input_format = "jsonl"
+
+    if input_format == "jsonl":
+        return read_jsonl(args.input, args.content_field, args.metadata_fields, offset or 0)
+    if input_format == "parquet":
+        return read_parquet(args.input, args.content_field, args.metadata_fields, args.batch_size)
+    return read_text_directory(args.input)
+
+
+def batched(iterable, size: int) -> Iterator[list]:
+    """Yield lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Checkpoint:
+    """Number of input records fully written, persisted after every batch
+
+    JSONL imports also record the byte offset after the last written record,
+    so resuming seeks straight to it instead of re-parsing the file.
+    """
+
+    def __init__(self, path: str, input_path: str, tenant_id: Optional[str]):
+        self.path = path
+        self.state = {"input": os.path.abspath(input_path), "tenant_id": tenant_id, "position": 0,
+                      "offset": None, "written": 0, "skipped": 0}
+
+    def load(self, restart: bool):
+        """Resume from an existing checkpoint for the same input"""
+        if restart or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("input") != self.state["input"] or saved.get("tenant_id") != self.state["tenant_id"]:
+            raise SystemExit(f"Checkpoint {self.path} belongs to another import ({saved.get('input')}); "
+                             f"use --restart or a different --checkpoint")
+        self.state.update(saved)
+
+    def save(self):
+        """Atomically write the checkpoint"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+# Worker-process state: a database-less service used only to prepare documents
+_worker_service = None
+
+
+def _init_worker(embedding_threads: int):
+    """Load the models once per worker process"""
+    global _worker_service
+    from .services.graph_rag_service import GraphRAGService
+
+    settings.EMBEDDING_THREADS = embedding_threads
+    initialize_embedding_cache()
+    _worker_service = GraphRAGService(connect_databases=False)
+
+
+def _prepare_batch(contents: List[str], hashes: List[str]):
+    """Embed and extract entities for one batch in a worker process"""
+    return _worker_service.prepare_documents(contents, hashes)
+
+
+class _ImmediateResult:
+    """Future-like wrapper for batches prepared in-process (--workers 0)"""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+def run(args) -> Dict[str, Any]:
+    """Run the import and return the final checkpoint state"""
+    from .services.graph_rag_service import GraphRAGService
+
+    if not initialize_databases():
+        raise SystemExit("Could not initialize databases")
+    service = GraphRAGService()
+
+    checkpoint = Checkpoint(args.checkpoint, args.input, args.tenant_id)
+    checkpoint.load(args.restart)
+    if checkpoint.state["position"]:
+        print(f"Resuming after {checkpoint.state['position']} records", file=sys.stderr)
+
+    executor = None
+    if args.workers > 0:
+        # Split the cores between workers unless a thread count was configured
+        threads = settings.EMBEDDING_THREADS or max(1, (os.cpu_count() or 1) // args.workers)
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,)
+        )
+    max_in_flight = max(1, args.workers * 2)
+
+    offset = checkpoint.state["offset"]
+    records = open_reader(args, offset)
+    if offset is None:
+        # Parquet and text inputs resume by skipping the records already written
+        records = itertools.islice(records, checkpoint.state["position"], None)
+    in_flight = deque()
+    pending_ids = set()
+    start_time = time.time()
+    last_report = start_time
+    processed = 0
+
+    def report(final: bool = False):
+        elapsed = time.time() - start_time
+        rate = processed / elapsed if elapsed else 0.0
+        state = checkpoint.state
+        print(f"[bulk-import] {state['position']} records ({state['written']} written, {state['skipped']} skipped) "
+              f"| {rate:.1f} records/s | {elapsed:.0f}s elapsed{' | done' if final else ''}", file=sys.stderr)
+
+    def drain_one():
+        nonlocal processed, last_report
+        batch_size, end_offset, new_documents, future = in_flight.popleft()
+        if new_documents:
+            embeddings, entities = future.result()
+            service.write_documents(new_documents, embeddings, entities, tenant_id=args.tenant_id)
+            pending_ids.difference_update(doc['id'] for doc in new_documents)
+
+        checkpoint.state["position"] += batch_size
+        checkpoint.state["offset"] = end_offset
+        checkpoint.state["written"] += len(new_documents)
+        checkpoint.state["skipped"] += batch_size - len(new_documents)
+        checkpoint.save()
+
+        processed += batch_size
+        if time.time() - last_report >= args.report_every:
+            report()
+            last_report = time.time()
+
+    try:
+        for batch in batched(records, args.batch_size):
+            documents = [(content, metadata) for content, metadata, _ in batch if content.strip()]
+            new_documents = service.filter_new_documents(documents, tenant_id=args.tenant_id) if documents else []
+            # Content already queued in an earlier, not yet written batch is a duplicate too
+            new_documents = [doc for doc in new_documents if doc['id'] not in pending_ids]
+            pending_ids.update(doc['id'] for doc in new_documents)
+
+            contents = [doc['content'] for doc in new_documents]
+            hashes = [doc['hash'] for doc in new_documents]
+            if not new_documents:
+                future = _ImmediateResult(None)
+            elif executor is not None:
+                future = executor.submit(_prepare_batch, contents, hashes)
+            else:
+                future = _ImmediateResult(service.prepare_documents(contents, hashes))
+            in_flight.append((len(batch), batch[-1][2], new_documents, future))
+
+            while len(in_flight) >= max_in_flight:
+                drain_one()
+
+        while in_flight:
+            drain_one()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        close_databases()
+
+    report(final=True)
+    return checkpoint.state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import documents into the Graph RAG stores without the HTTP API")
+    parser.add_argument("input", help="JSONL file, Parquet file or directory of .txt/.md files")
+    parser.add_argument("--format", choices=["jsonl", "parquet", "text"], help="Input format (default: from the input path)")
+    parser.add_argument("--content-field", default="content", help="Field holding the document text (JSONL/Parquet)")
+    parser.add_argument("--metadata-fields", nargs="+", help="Fields to store as metadata (JSONL/Parquet)")
+    parser.add_argument("--tenant-id", help="Tenant to import the documents into")
+    parser.add_argument("--batch-size", type=int, default=256, help="Documents per batch")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Worker processes for embedding and entity extraction (0 = in-process)")
+    parser.add_argument("--checkpoint", default="./data/bulk_import.checkpoint.json", help="Checkpoint file")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    # Per-batch INFO logs would drown the progress report
+    logging.getLogger().setLevel(logging.WARNING)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import uvicorn
 from dotenv import load_dotenv
 import os
@@ -10,8 +10,10 @@ import logging
 from .routers import query, documents
 
 # Import database utilities
-from .utils.database import initialize_databases
+from .utils.database import initialize_embedding_cache, close_databases
+from .utils.store_supervisor import get_store_supervisor
 from .utils.config import settings
+from .services.admission import AdmissionRejected, get_governor
 
 # Load environment variables
 load_dotenv()
@@ -24,7 +26,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Graph RAG MVP API",
     description="A Graph RAG system combining vector search and knowledge graphs",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for frontend communication
@@ -41,13 +44,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def require_stores_ready():
+    """Reject API calls with 503 until ChromaDB and Neo4j are both connected"""
+    if not get_store_supervisor().is_ready():
+        raise HTTPException(status_code=503, detail="Databases are not ready yet", headers={"Retry-After": "1"})
+
 # Include routers
-app.include_router(query.router)
-app.include_router(documents.router)
+app.include_router(query.router, dependencies=[Depends(require_stores_ready)])
+app.include_router(documents.router, dependencies=[Depends(require_stores_ready)])
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    """Shed overload fast with 429/503 and a Retry-After hint"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize databases on startup"""
+    """Start connecting the databases in the background
+    
+    Startup does not wait for the stores: ChromaDB and Neo4j connect
+    concurrently with exponential backoff and are reconnected if they drop.
+    /ready returns 503, and API routes reject requests, until both are up.
+    """
     logger.info("Starting Graph RAG MVP API...")
     
     # Validate settings
@@ -55,34 +77,26 @@ async def startup_event():
         logger.error("Invalid settings configuration")
         return
     
-    # Wait for Neo4j to be ready
-    logger.info("Waiting for Neo4j to be ready...")
-    import time
-    import asyncio
-    
-    max_retries = 30
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            if initialize_databases():
-                logger.info("All databases initialized successfully")
-                return
-            else:
-                logger.warning(f"Database initialization failed, retrying... ({retry_count + 1}/{max_retries})")
-        except Exception as e:
-            logger.warning(f"Database connection failed, retrying... ({retry_count + 1}/{max_retries}): {e}")
-        
-        retry_count += 1
-        await asyncio.sleep(2)  # Wait 2 seconds between retries
-    
-    logger.error("Failed to initialize databases after maximum retries")
+    initialize_embedding_cache()
+    get_store_supervisor().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush indexes and close database connections on shutdown"""
+    await get_store_supervisor().stop()
+    close_databases()
 
 @app.get("/")
 async def root():
     """Root endpoint to check if API is running"""
     return {"message": "Graph RAG MVP API is running!", "status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once ChromaDB and Neo4j are both connected, 503 until then"""
+    info = get_store_supervisor().get_info()
+    return JSONResponse(status_code=200 if info["ready"] else 503, content=info)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -101,7 +115,8 @@ async def health_check():
             },
             "details": {
                 "chroma": chroma_info,
-                "neo4j": neo4j_info
+                "neo4j": neo4j_info,
+                "admission": get_governor().get_info()
             }
         }
     except Exception as e:
@@ -0,0 +1,76 @@
+"""
+Lightweight internal records for the query path.
+
+The service builds these instead of pydantic models: a graph context can
+hold thousands of entities and relationships, and constructing, validating
+and dumping a pydantic model per row dominated response time. Validation
+happens once at the API edge (QueryRequest); responses are serialised
+straight from to_dict() with orjson. The dict shapes match the
+QueryResponse / GraphContext schemas in schemas.py.
+"""
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+
+@dataclass(slots=True)
+class EntityRecord:
+    """Graph entity"""
+    id: str
+    name: str
+    type: str
+    properties: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name, "type": self.type, "properties": self.properties}
+
+
+@dataclass(slots=True)
+class RelationshipRecord:
+    """Graph relationship between two entities"""
+    source_id: str
+    target_id: str
+    relationship_type: str
+    properties: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source_id": self.source_id,
+            "target_id": self.target_id,
+            "relationship_type": self.relationship_type,
+            "properties": self.properties
+        }
+
+
+@dataclass(slots=True)
+class GraphContextRecord:
+    """Entities and relationships retrieved for a query"""
+    entities: List[EntityRecord] = field(default_factory=list)
+    relationships: List[RelationshipRecord] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "entities": [entity.to_dict() for entity in self.entities],
+            "relationships": [relationship.to_dict() for relationship in self.relationships],
+            "subgraph": None
+        }
+
+
+@dataclass(slots=True)
+class QueryResult:
+    """Answer to a query, serialised as a QueryResponse"""
+    answer: str
+    sources: List[Dict[str, Any]]
+    graph_context: Optional[GraphContextRecord]
+    confidence_score: float
+    processing_time: float
+    queue_time: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "answer": self.answer,
+            "sources": self.sources,
+            "graph_context": self.graph_context.to_dict() if self.graph_context else None,
+            "confidence_score": self.confidence_score,
+            "processing_time": self.processing_time,
+            "queue_time": self.queue_time
+        }
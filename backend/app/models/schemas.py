@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 
 # Query Models
@@ -8,6 +8,14 @@ class QueryRequest(BaseModel):
     query: str = Field(..., description="The user's question or query")
     max_results: int = Field(default=5, description="Maximum number of results to return")
     include_graph_context: bool = Field(default=True, description="Whether to include graph relationships")
+    filters: Optional[Dict[str, Any]] = Field(default=None, description="Metadata filters applied before search, e.g. {\"department\": \"legal\", \"year\": {\"$gte\": 2023}}")
+    tenant_id: Optional[str] = Field(default=None, description="Tenant whose documents and graph partition are searched")
+    mode: Literal["auto", "local", "global"] = Field(default="auto", description="'local' searches documents and entity neighbourhoods, 'global' answers from community summaries, 'auto' picks global for corpus-wide questions that name no entity")
+
+class BatchQueryRequest(BaseModel):
+    """Request model for batch queries"""
+    queries: List[QueryRequest] = Field(..., description="Queries to process")
+    max_concurrency: Optional[int] = Field(default=None, ge=1, description="Maximum concurrent LLM calls (defaults to BATCH_QUERY_LLM_CONCURRENCY)")
 
 class QueryResponse(BaseModel):
     """Response model for query results"""
@@ -16,6 +24,7 @@ class QueryResponse(BaseModel):
     graph_context: Optional[Dict[str, Any]] = Field(default=None, description="Graph relationships found")
     confidence_score: float = Field(..., description="Confidence score of the answer")
     processing_time: float = Field(..., description="Time taken to process the query")
+    queue_time: float = Field(default=0.0, description="Time spent waiting for admission before processing")
 
 # Document Models
 class DocumentUpload(BaseModel):
@@ -23,6 +32,7 @@ class DocumentUpload(BaseModel):
     content: str = Field(..., description="Document content")
     metadata: Optional[Dict[str, Any]] = Field(default={}, description="Document metadata")
     document_type: str = Field(default="text", description="Type of document")
+    tenant_id: Optional[str] = Field(default=None, description="Tenant the document belongs to")
 
 class DocumentResponse(BaseModel):
     """Response model for document operations"""
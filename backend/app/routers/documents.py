@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from ..models.schemas import DocumentUpload, DocumentResponse
 from ..services.graph_rag_service import GraphRAGService
+from ..services.admission import ConcurrencyGovernor, get_governor, get_request_deadline
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,7 +19,7 @@ def get_graph_rag_service():
     return graph_rag_service
 
 @router.post("/upload", response_model=DocumentResponse)
-async def upload_document(document: DocumentUpload):
+async def upload_document(document: DocumentUpload, deadline: Optional[float] = Depends(get_request_deadline)):
     """
     Upload a document to the Graph RAG system
     
@@ -26,73 +28,170 @@ async def upload_document(document: DocumentUpload):
     2. Extract entities and add them to the knowledge graph
     3. Create relationships between entities
     """
-    try:
-        logger.info(f"Uploading document of type: {document.document_type}")
-        
-        # Add document to the system
-        service = get_graph_rag_service()
-        doc_id = service.add_document(
-            content=document.content,
-            metadata=document.metadata
-        )
-        
-        logger.info(f"Document uploaded successfully with ID: {doc_id}")
-        
-        return DocumentResponse(
-            id=doc_id,
-            status="success",
-            message="Document uploaded and processed successfully"
-        )
-        
-    except Exception as e:
-        logger.error(f"Error uploading document: {e}")
-        raise HTTPException(status_code=500, detail=f"Error uploading document: {str(e)}")
+    ticket = await get_governor().admit(ConcurrencyGovernor.INGEST, deadline)
+    async with ticket:
+        try:
+            logger.info(f"Uploading document of type: {document.document_type}")
+            
+            # Add document to the system
+            service = get_graph_rag_service()
+            doc_id = await run_in_threadpool(
+                service.add_document,
+                content=document.content,
+                metadata=document.metadata,
+                tenant_id=document.tenant_id
+            )
+            
+            logger.info(f"Document uploaded successfully with ID: {doc_id}")
+            
+            return DocumentResponse(
+                id=doc_id,
+                status="success",
+                message="Document uploaded and processed successfully"
+            )
+            
+        except Exception as e:
+            logger.error(f"Error uploading document: {e}")
+            raise HTTPException(status_code=500, detail=f"Error uploading document: {str(e)}")
 
 @router.post("/batch-upload", response_model=List[DocumentResponse])
-async def batch_upload_documents(documents: List[DocumentUpload]):
+async def batch_upload_documents(documents: List[DocumentUpload],
+                                 deadline: Optional[float] = Depends(get_request_deadline)):
     """
     Upload multiple documents in batch
     """
-    try:
-        logger.info(f"Batch uploading {len(documents)} documents")
-        
-        responses = []
-        for document in documents:
-            try:
-                service = get_graph_rag_service()
-                doc_id = service.add_document(
-                    content=document.content,
-                    metadata=document.metadata
-                )
-                
-                responses.append(DocumentResponse(
-                    id=doc_id,
-                    status="success",
-                    message="Document uploaded and processed successfully"
-                ))
-                
-            except Exception as e:
-                logger.error(f"Error processing document in batch: {e}")
-                responses.append(DocumentResponse(
-                    id="unknown",
-                    status="error",
-                    message=f"Error processing document: {str(e)}"
-                ))
-        
-        logger.info(f"Batch upload completed. {len([r for r in responses if r.status == 'success'])} successful")
-        return responses
-        
-    except Exception as e:
-        logger.error(f"Error in batch upload: {e}")
-        raise HTTPException(status_code=500, detail=f"Error in batch upload: {str(e)}")
+    ticket = await get_governor().admit(ConcurrencyGovernor.INGEST, deadline)
+    async with ticket:
+        try:
+            logger.info(f"Batch uploading {len(documents)} documents")
+            
+            responses = []
+            for document in documents:
+                try:
+                    service = get_graph_rag_service()
+                    doc_id = await run_in_threadpool(
+                        service.add_document,
+                        content=document.content,
+                        metadata=document.metadata,
+                        tenant_id=document.tenant_id
+                    )
+                    
+                    responses.append(DocumentResponse(
+                        id=doc_id,
+                        status="success",
+                        message="Document uploaded and processed successfully"
+                    ))
+                    
+                except Exception as e:
+                    logger.error(f"Error processing document in batch: {e}")
+                    responses.append(DocumentResponse(
+                        id="unknown",
+                        status="error",
+                        message=f"Error processing document: {str(e)}"
+                    ))
+            
+            logger.info(f"Batch upload completed. {len([r for r in responses if r.status == 'success'])} successful")
+            return responses
+            
+        except Exception as e:
+            logger.error(f"Error in batch upload: {e}")
+            raise HTTPException(status_code=500, detail=f"Error in batch upload: {str(e)}")
+
+@router.put("/{doc_id}", response_model=DocumentResponse)
+async def update_document(doc_id: str, document: DocumentUpload, background_tasks: BackgroundTasks,
+                          deadline: Optional[float] = Depends(get_request_deadline)):
+    """
+    Replace a document's content and metadata
+    
+    New content is stored under its new content-hash ID and the old
+    document's vectors and graph mentions are released.
+    """
+    ticket = await get_governor().admit(ConcurrencyGovernor.INGEST, deadline)
+    async with ticket:
+        try:
+            service = get_graph_rag_service()
+            new_id = await run_in_threadpool(
+                service.update_document,
+                doc_id=doc_id,
+                content=document.content,
+                metadata=document.metadata,
+                tenant_id=document.tenant_id
+            )
+            if new_id is None:
+                raise HTTPException(status_code=404, detail=f"Document not found: {doc_id}")
+            
+            background_tasks.add_task(service.compact_if_needed, document.tenant_id)
+            
+            return DocumentResponse(
+                id=new_id,
+                status="success",
+                message="Document updated successfully"
+            )
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating document: {e}")
+            raise HTTPException(status_code=500, detail=f"Error updating document: {str(e)}")
+
+@router.delete("/{doc_id}", response_model=DocumentResponse)
+async def delete_document(doc_id: str, background_tasks: BackgroundTasks, tenant_id: Optional[str] = None,
+                          deadline: Optional[float] = Depends(get_request_deadline)):
+    """
+    Delete a document
+    
+    This will:
+    1. Remove its vectors from ChromaDB and its postings from the BM25 index
+    2. Decrement mention counts of its entities and relationships in Neo4j
+    3. Delete entities and relationships no longer mentioned by any document
+    4. Compact the ChromaDB collection in the background once enough documents are deleted
+    """
+    ticket = await get_governor().admit(ConcurrencyGovernor.INGEST, deadline)
+    async with ticket:
+        try:
+            service = get_graph_rag_service()
+            if not await run_in_threadpool(service.delete_document, doc_id, tenant_id=tenant_id):
+                raise HTTPException(status_code=404, detail=f"Document not found: {doc_id}")
+            
+            background_tasks.add_task(service.compact_if_needed, tenant_id)
+            
+            return DocumentResponse(
+                id=doc_id,
+                status="success",
+                message="Document deleted successfully"
+            )
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting document: {e}")
+            raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
+
+@router.post("/communities/refresh")
+async def refresh_communities(tenant_id: Optional[str] = None, full: bool = False,
+                              deadline: Optional[float] = Depends(get_request_deadline)):
+    """
+    Recompute community summaries used for global questions
+    
+    Only communities touched by documents ingested or deleted since the last
+    refresh are recomputed, unless full is set.
+    """
+    ticket = await get_governor().admit(ConcurrencyGovernor.INGEST, deadline)
+    async with ticket:
+        try:
+            service = get_graph_rag_service()
+            return await run_in_threadpool(service.refresh_communities, tenant_id=tenant_id, full=full)
+        except Exception as e:
+            logger.error(f"Error refreshing communities: {e}")
+            raise HTTPException(status_code=500, detail=f"Error refreshing communities: {str(e)}")
 
 @router.get("/stats")
-async def get_document_stats():
+async def get_document_stats(tenant_id: Optional[str] = None):
     """Get statistics about uploaded documents"""
     try:
         from ..utils.database import get_chroma_manager, get_neo4j_manager
         
-        chroma_info = get_chroma_manager().get_collection_info()
+        chroma_info = get_chroma_manager().get_collection_info(tenant_id)
         neo4j_info = get_neo4j_manager().get_database_info()
         
         return {
@@ -1,8 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 from typing import Optional
-from ..models.schemas import QueryRequest, QueryResponse
+import orjson
+import threading
+from ..models.schemas import QueryRequest, QueryResponse, BatchQueryRequest
 from ..services.graph_rag_service import GraphRAGService
+from ..services.admission import ConcurrencyGovernor, get_governor, get_request_deadline, server_timing
 from ..utils.database import get_chroma_manager, get_neo4j_manager
+from ..utils.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +25,7 @@ def get_graph_rag_service():
     return graph_rag_service
 
 @router.post("/", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, deadline: Optional[float] = Depends(get_request_deadline)):
     """
     Process a user query using Graph RAG
     
@@ -26,24 +33,99 @@ async def process_query(request: QueryRequest):
     1. Semantic search using ChromaDB
     2. Graph traversal using Neo4j
     3. LLM generation using OpenAI
+    
+    Runs in the interactive admission lane: when the lane is saturated the
+    request is rejected with 429 (queue full) or 503 (deadline passed while
+    queued), both with a Retry-After header.
+    
+    The response is serialised straight from the service's records with
+    orjson; QueryResponse documents its shape but is not re-validated.
+    """
+    ticket = await get_governor().admit(ConcurrencyGovernor.INTERACTIVE, deadline)
+    async with ticket:
+        try:
+            logger.info(f"Processing query: {request.query}")
+            
+            # Process the query using Graph RAG
+            service = get_graph_rag_service()
+            response = await run_in_threadpool(
+                service.process_query,
+                query=request.query,
+                max_results=request.max_results,
+                include_graph_context=request.include_graph_context,
+                filters=request.filters,
+                tenant_id=request.tenant_id,
+                mode=request.mode
+            )
+            response.queue_time = ticket.queue_time
+            
+            logger.info(f"Query processed successfully. Confidence: {response.confidence_score}")
+            return ORJSONResponse(
+                response.to_dict(),
+                headers={"Server-Timing": server_timing(ticket.queue_time, response.processing_time)}
+            )
+            
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+
+@router.post("/batch")
+async def process_query_batch(request: BatchQueryRequest, deadline: Optional[float] = Depends(get_request_deadline)):
+    """
+    Process many queries in one call
+    
+    Retrieval is vectorised across the batch (one spaCy pass, one embedding
+    call, one multi-query ChromaDB request per tenant/filter group and one
+    Neo4j lookup per tenant) and LLM calls run with bounded concurrency.
+    Results stream back as newline-delimited JSON in completion order, one
+    line per query: {"index": i, "status": "success", "response": {...}} or
+    {"index": i, "status": "error", "error": "..."}.
+    
+    Batches run in their own admission lane so they cannot starve
+    interactive queries; the slot is held until the stream finishes.
     """
+    if len(request.queries) > settings.BATCH_QUERY_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(request.queries)} > {settings.BATCH_QUERY_MAX_SIZE}")
+    
+    ticket = await get_governor().admit(ConcurrencyGovernor.BATCH, deadline)
     try:
-        logger.info(f"Processing query: {request.query}")
-        
-        # Process the query using Graph RAG
+        logger.info(f"Processing batch of {len(request.queries)} queries")
         service = get_graph_rag_service()
-        response = service.process_query(
-            query=request.query,
-            max_results=request.max_results,
-            include_graph_context=request.include_graph_context
-        )
+        cancelled = threading.Event()
         
-        logger.info(f"Query processed successfully. Confidence: {response.confidence_score}")
-        return response
+        def finish():
+            # Stop queued LLM calls before the slot goes back to the lane
+            cancelled.set()
+            ticket.release()
         
-    except Exception as e:
-        logger.error(f"Error processing query: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+        async def stream_results():
+            try:
+                results = service.process_queries(
+                    [query.dict() for query in request.queries],
+                    max_concurrency=request.max_concurrency,
+                    cancel=cancelled
+                )
+                async for index, result in iterate_in_threadpool(results):
+                    if isinstance(result, Exception):
+                        line = {"index": index, "status": "error", "error": str(result)}
+                    else:
+                        result.queue_time = ticket.queue_time
+                        line = {"index": index, "status": "success", "response": result.to_dict()}
+                    yield orjson.dumps(line, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+            finally:
+                finish()
+        
+        # The generator's finally does not run if the client disconnects before
+        # the stream starts, so the response also stops the batch when it ends
+        return StreamingResponse(
+            stream_results(),
+            media_type="application/x-ndjson",
+            headers={"Server-Timing": server_timing(ticket.queue_time)},
+            background=BackgroundTask(finish)
+        )
+    except Exception:
+        ticket.release()
+        raise
 
 @router.get("/health")
 async def query_health():
@@ -0,0 +1,224 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from typing import Dict, Any, Optional, List
+
+from fastapi import Header
+
+from ..utils.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being queued or run"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted execution slot; release it exactly once when the work is done"""
+
+    def __init__(self, lane: "Lane", queue_time: float):
+        self.lane = lane
+        self.queue_time = queue_time
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        """Free the slot (idempotent)"""
+        if not self._released:
+            self._released = True
+            self.lane._release(time.monotonic() - self._started)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class Lane:
+    """Bounded-concurrency lane with a bounded, earliest-deadline-first wait queue
+
+    At most ``concurrency`` requests run at once and at most ``max_queue``
+    wait. A request arriving to a full queue is rejected with 429; a request
+    whose deadline passes before it gets a slot is dropped with 503, so no
+    work is spent on answers the client has already given up on.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiters: List[list] = []  # heap of [deadline, seq, future]
+        self._seq = itertools.count()
+        # Exponentially-weighted mean service time, used for Retry-After estimates
+        self._service_time = 1.0
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "dropped_deadline": 0}
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for a slot"""
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+        backlog = (self.queued + self._active) / max(1, self.concurrency)
+        return max(1, int(backlog * self._service_time + 0.999))
+
+    async def acquire(self, deadline: Optional[float] = None) -> Ticket:
+        """Wait for a slot; deadline is a time.monotonic() timestamp"""
+        arrived = time.monotonic()
+        if deadline is not None and deadline <= arrived:
+            self.stats["dropped_deadline"] += 1
+            raise AdmissionRejected(503, f"Request deadline already passed ({self.name} lane)", self.retry_after())
+
+        if self._active < self.concurrency and not self.queued:
+            self._active += 1
+            self.stats["admitted"] += 1
+            return Ticket(self, 0.0)
+
+        if self.queued >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise AdmissionRejected(429, f"Too many queued requests ({self.name} lane)", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [deadline if deadline is not None else float("inf"), next(self._seq), future]
+        heapq.heappush(self._waiters, entry)
+        timeout = None if deadline is None else deadline - arrived
+        try:
+            # The slot is handed over by _release, so _active is already counted
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            self.stats["dropped_deadline"] += 1
+            raise AdmissionRejected(503, f"Request deadline passed while queued ({self.name} lane)", self.retry_after())
+        except asyncio.CancelledError:
+            # Client disconnected while queued
+            self._abandon(future)
+            raise
+
+        self.stats["admitted"] += 1
+        return Ticket(self, time.monotonic() - arrived)
+
+    def _abandon(self, future: asyncio.Future):
+        """Withdraw a waiter, giving its slot back if it was granted in the meantime"""
+        if not future.done():
+            future.cancel()
+        elif not future.cancelled() and future.exception() is None:
+            self._release(None)
+    
+    def _release(self, service_time: Optional[float]):
+        """Free a slot and hand it to the waiter with the earliest live deadline"""
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+
+        now = time.monotonic()
+        while self._waiters:
+            deadline, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            if deadline <= now:
+                # Don't start work whose client has already timed out
+                self.stats["dropped_deadline"] += 1
+                future.set_exception(AdmissionRejected(
+                    503, f"Request deadline passed while queued ({self.name} lane)", self.retry_after()
+                ))
+                continue
+            future.set_result(None)
+            return
+        self._active -= 1
+
+    def get_info(self) -> Dict[str, Any]:
+        """Current lane state for health checks"""
+        return {
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "mean_service_time": round(self._service_time, 3),
+            **self.stats,
+        }
+
+
+class ConcurrencyGovernor:
+    """Admission control in front of GraphRAGService, with one lane per traffic class"""
+
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+    INGEST = "ingest"
+
+    def __init__(self, lanes: Dict[str, Lane]):
+        self.lanes = lanes
+
+    @classmethod
+    def from_settings(cls) -> "ConcurrencyGovernor":
+        """Build the lanes from ADMISSION_* settings"""
+        return cls({
+            cls.INTERACTIVE: Lane(cls.INTERACTIVE, settings.ADMISSION_INTERACTIVE_CONCURRENCY, settings.ADMISSION_INTERACTIVE_QUEUE),
+            cls.BATCH: Lane(cls.BATCH, settings.ADMISSION_BATCH_CONCURRENCY, settings.ADMISSION_BATCH_QUEUE),
+            cls.INGEST: Lane(cls.INGEST, settings.ADMISSION_INGEST_CONCURRENCY, settings.ADMISSION_INGEST_QUEUE),
+        })
+
+    async def admit(self, lane: str, deadline: Optional[float] = None) -> Ticket:
+        """Acquire a slot in a lane; use the returned ticket as an async context manager"""
+        try:
+            return await self.lanes[lane].acquire(deadline)
+        except AdmissionRejected as e:
+            logger.warning(f"Shed request: {e.reason} (retry after {e.retry_after}s)")
+            raise
+
+    def get_info(self) -> Dict[str, Any]:
+        """State of every lane"""
+        return {name: lane.get_info() for name, lane in self.lanes.items()}
+
+
+def request_deadline(timeout_seconds: Optional[float] = None, deadline_epoch: Optional[float] = None) -> Optional[float]:
+    """Monotonic deadline from a client's relative timeout or absolute (epoch) deadline
+    
+    Falls back to ADMISSION_DEFAULT_TIMEOUT; returns None for no deadline.
+    """
+    if deadline_epoch is not None:
+        return time.monotonic() + (deadline_epoch - time.time())
+    if timeout_seconds is None:
+        timeout_seconds = settings.ADMISSION_DEFAULT_TIMEOUT
+    if timeout_seconds <= 0:
+        return None
+    return time.monotonic() + timeout_seconds
+
+
+async def get_request_deadline(
+    x_request_timeout: Optional[float] = Header(default=None),
+    x_request_deadline: Optional[float] = Header(default=None)
+) -> Optional[float]:
+    """Dependency reading the client deadline from X-Request-Timeout (seconds) or X-Request-Deadline (epoch)"""
+    return request_deadline(x_request_timeout, x_request_deadline)
+
+
+def server_timing(queue_time: float, processing_time: Optional[float] = None) -> str:
+    """Server-Timing header value with queue wait as its own stage"""
+    stages = [f"queue;dur={queue_time * 1000:.1f}"]
+    if processing_time is not None:
+        stages.append(f"process;dur={processing_time * 1000:.1f}")
+    return ", ".join(stages)
+
+
+# Global governor
+governor: Optional[ConcurrencyGovernor] = None
+
+
+def get_governor() -> ConcurrencyGovernor:
+    """Get the process-wide concurrency governor"""
+    global governor
+    if governor is None:
+        governor = ConcurrencyGovernor.from_settings()
+    return governor
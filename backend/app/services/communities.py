@@ -0,0 +1,212 @@
+import re
+import time
+import random
+import logging
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Callable
+
+from ..utils.config import settings
+from ..utils.database import get_chroma_manager, get_neo4j_manager
+from ..utils.embedding_cache import content_hash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Questions about the corpus as a whole rather than about specific entities. Kept
+# narrow: "summarize ..." or "... across the X" alone usually targets one thing.
+GLOBAL_QUERY_PATTERN = re.compile(
+    r"\b(main|key|common|recurring|overall|major|top)\s+(themes?|topics?|trends?|patterns?)\b"
+    r"|\bacross\s+(all|every|the\s+(whole|entire))\b"
+    r"|\b(summari[sz]e|overview\s+of)\s+(everything|all\b|the\s+(whole|entire)\b"
+    r"|(the|our)\s+(corpus|documents|dataset|collection|knowledge\s+base)\b)"
+    r"|\bbig\s+picture\b",
+    re.IGNORECASE
+)
+
+# Identifiers such as "ERR-404", "SKU_1234" or "INV-77" name a specific thing even
+# when spaCy does not tag them as entities
+IDENTIFIER_PATTERN = re.compile(r"\b[a-z]+[\-_]\d+\b", re.IGNORECASE)
+
+
+def is_global_query(query: str, entities: Optional[List[str]] = None) -> bool:
+    """Heuristic for questions best answered from community summaries
+
+    Queries naming an entity (``entities`` extracted from the query, or an
+    identifier) are answered locally from that entity's neighbourhood.
+    """
+    if entities or IDENTIFIER_PATTERN.search(query):
+        return False
+    return bool(GLOBAL_QUERY_PATTERN.search(query))
+
+
+def label_propagation(adjacency: Dict[str, Dict[str, float]], nodes: List[str], labels: Dict[str, str],
+                      max_iterations: int = 20, seed: int = 0) -> Dict[str, str]:
+    """Weighted asynchronous label propagation
+
+    Each node in ``nodes`` repeatedly adopts the label carrying the most edge
+    weight among its neighbours until no label changes. Nodes outside
+    ``nodes`` keep their label in ``labels``, which is how an incremental
+    refresh leaves untouched communities alone while still letting touched
+    entities join them. ``labels`` must hold an initial label for every node
+    and is updated in place.
+    """
+    rng = random.Random(seed)
+    order = sorted(nodes)
+    for _ in range(max_iterations):
+        rng.shuffle(order)
+        changed = 0
+        for node in order:
+            weights: Dict[str, float] = defaultdict(float)
+            for neighbour, weight in adjacency.get(node, {}).items():
+                label = labels.get(neighbour)
+                if label is not None:
+                    weights[label] += weight
+            if not weights:
+                continue
+            best = max(weights.values())
+            candidates = sorted(label for label, weight in weights.items() if weight == best)
+            # Keeping the current label on ties is what makes the process converge
+            if labels[node] in candidates:
+                continue
+            labels[node] = candidates[0] if len(candidates) == 1 else rng.choice(candidates)
+            changed += 1
+        if not changed:
+            break
+    return labels
+
+
+def summarize_community(profile: Dict[str, Any], snippets: Dict[str, str]) -> str:
+    """Compact extractive summary of a community profile"""
+    entities = profile["entities"]
+    names = [entity["name"] for entity in entities]
+    more = profile["size"] - len(names)
+    lines = [f"Theme: {', '.join(names[:5])}{f' (+{more} more entities)' if more > 0 else ''}"]
+
+    lines.append("Key entities: " + "; ".join(
+        f"{entity['name']} ({entity['type']}, {entity['mentions']} mentions)" for entity in entities
+    ))
+    if profile["pairs"]:
+        lines.append("Key relationships: " + "; ".join(
+            f"{pair['source']} - {pair['target']} ({pair['shared']} shared documents)" for pair in profile["pairs"]
+        ))
+    for key in profile["documents"]:
+        snippet = snippets.get(key)
+        if snippet:
+            lines.append(f"Excerpt: {snippet}")
+
+    return "\n".join(lines)[:settings.COMMUNITY_SUMMARY_MAX_CHARS]
+
+
+class CommunityIndexer:
+    """Offline community detection and summary indexing over the entity graph
+
+    Entities are clustered with label propagation over co-mention and
+    RELATES_TO edges. Every community with at least COMMUNITY_MIN_SIZE
+    members gets a compact summary, stored on a (:Community) node in Neo4j
+    and indexed in the tenant's community collection in ChromaDB, so global
+    questions can be answered from a few summaries. Ingest and delete flag
+    the entities they touch, and a refresh only recomputes the communities
+    those entities belong to.
+    """
+
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]]):
+        self.embed = embed
+        self.chroma_manager = get_chroma_manager()
+        self.neo4j_manager = get_neo4j_manager()
+
+    def _community_id(self, members: List[str], tenant_id: Optional[str]) -> str:
+        """Community ID derived from its members, so an unchanged community keeps its ID"""
+        return f"community_{content_hash(chr(0).join([tenant_id or '', *sorted(members)]))[:16]}"
+
+    def refresh(self, tenant_id: Optional[str] = None, full: bool = False) -> Dict[str, Any]:
+        """Recompute touched communities (all with full=True) and re-index their summaries"""
+        start_time = time.time()
+        scope = self.neo4j_manager.get_community_scope(tenant_id, full=full)
+        if not scope:
+            return {"entities": 0, "communities": 0, "summarized": 0, "removed": 0, "seconds": 0.0}
+
+        scope_ids = [row["id"] for row in scope]
+        old_communities = {row["community_id"] for row in scope if row["community_id"]}
+
+        # Scope entities start as singletons; neighbours outside the scope keep their community
+        adjacency: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        labels: Dict[str, str] = {entity_id: entity_id for entity_id in scope_ids}
+        in_scope = set(scope_ids)
+        for edge in self.neo4j_manager.get_entity_neighbours(scope_ids):
+            adjacency[edge["source"]][edge["target"]] += edge["weight"]
+            if edge["target"] not in in_scope and edge["target_community"]:
+                labels[edge["target"]] = edge["target_community"]
+
+        label_propagation(adjacency, scope_ids, labels, max_iterations=settings.COMMUNITY_MAX_ITERATIONS)
+
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for entity_id in scope_ids:
+            groups[labels[entity_id]].append(entity_id)
+
+        assignments = []
+        new_communities = set()
+        for label, members in groups.items():
+            # Joining an untouched community keeps its ID; new groups get one from their members
+            community_id = label if label not in in_scope else self._community_id(members, tenant_id)
+            new_communities.add(community_id)
+            assignments.extend({"id": entity_id, "community_id": community_id} for entity_id in members)
+        self.neo4j_manager.assign_communities(assignments)
+
+        profiles = self.neo4j_manager.get_community_profiles(
+            sorted(new_communities),
+            top_entities=settings.COMMUNITY_SUMMARY_TOP_ENTITIES,
+            top_documents=settings.COMMUNITY_SUMMARY_TOP_DOCUMENTS
+        )
+        summarized = {cid: profile for cid, profile in profiles.items() if profile["size"] >= settings.COMMUNITY_MIN_SIZE}
+        self._index_summaries(summarized, tenant_id)
+
+        # Communities that dissolved, shrank below the minimum size or lost all their entities
+        removed = (old_communities | new_communities) - set(summarized)
+        removed.update(self.neo4j_manager.get_orphan_communities(tenant_id))
+        if removed:
+            self.neo4j_manager.delete_communities(sorted(removed))
+            self.chroma_manager.delete_communities(sorted(removed), tenant_id=tenant_id)
+
+        stats = {
+            "entities": len(scope_ids),
+            "communities": len(new_communities),
+            "summarized": len(summarized),
+            "removed": len(removed),
+            "seconds": round(time.time() - start_time, 3)
+        }
+        logger.info(f"Refreshed communities{' (full)' if full else ''}: {stats}")
+        return stats
+
+    def _index_summaries(self, profiles: Dict[str, Dict[str, Any]], tenant_id: Optional[str]):
+        """Summarize communities and write them to Neo4j and ChromaDB in batches"""
+        community_ids = sorted(profiles)
+        batch_size = 256
+        for start in range(0, len(community_ids), batch_size):
+            batch = community_ids[start:start + batch_size]
+            snippets = self._document_snippets([key for cid in batch for key in profiles[cid]["documents"]], tenant_id)
+            summaries = [summarize_community(profiles[cid], snippets) for cid in batch]
+
+            self.neo4j_manager.save_communities(
+                [{"id": cid, "size": profiles[cid]["size"], "summary": summary} for cid, summary in zip(batch, summaries)],
+                tenant_id=tenant_id
+            )
+            self.chroma_manager.upsert_communities(
+                ids=batch,
+                summaries=summaries,
+                embeddings=self.embed(summaries),
+                metadatas=[{"source_type": "community", "size": profiles[cid]["size"]} for cid in batch],
+                tenant_id=tenant_id
+            )
+
+    def _document_snippets(self, document_keys: List[str], tenant_id: Optional[str]) -> Dict[str, str]:
+        """Opening text of documents, by graph document key"""
+        if not document_keys:
+            return {}
+        # Graph keys are "<tenant>/<doc_id>" for tenants and "<doc_id>" otherwise
+        doc_ids = {key.rsplit("/", 1)[-1]: key for key in document_keys}
+        fetched = self.chroma_manager.get_documents(list(doc_ids), tenant_id=tenant_id)
+        length = settings.COMMUNITY_SNIPPET_CHARS
+        return {
+            doc_ids[doc_id]: " ".join(document[:length].split())
+            for doc_id, document in zip(fetched["ids"], fetched["documents"] or [])
+        }
@@ -0,0 +1,218 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from ..utils.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _hub_model_id(model_name: str) -> str:
+    """Resolve a sentence-transformers short name to its Hugging Face Hub id"""
+    if "/" in model_name or os.path.isdir(model_name):
+        return model_name
+    return f"sentence-transformers/{model_name}"
+
+
+def _read_model_json(hub_id: str, filename: str) -> Optional[Any]:
+    """Read a JSON file from a local model directory or a Hub repo (None if it has none)"""
+    if os.path.isdir(hub_id):
+        path = os.path.join(hub_id, filename)
+        if not os.path.exists(path):
+            return None
+    else:
+        from huggingface_hub import hf_hub_download
+        try:
+            path = hf_hub_download(hub_id, filename)
+        except Exception:
+            return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sentence_transformers_config(hub_id: str) -> Dict[str, Any]:
+    """Pooling mode, normalization and max sequence length of a sentence-transformers model
+
+    Plain transformers models without a pooling config get mean pooling, as
+    sentence-transformers itself does. Pooling modes the ONNX backend does
+    not implement are rejected rather than silently replaced. max_seq_length
+    is None when the model does not set one.
+    """
+    config = _read_model_json(hub_id, "1_Pooling/config.json")
+    modules = _read_model_json(hub_id, "modules.json") or []
+    normalize = any(module.get("type", "").endswith("Normalize") for module in modules)
+    max_seq_length = (_read_model_json(hub_id, "sentence_bert_config.json") or {}).get("max_seq_length")
+    if config is None:
+        logger.warning(f"{hub_id} has no sentence-transformers pooling config, using mean pooling")
+        return {"pooling": "mean", "normalize": normalize, "max_seq_length": max_seq_length}
+
+    modes = [mode for mode in ("cls_token", "mean_tokens", "max_tokens", "mean_sqrt_len_tokens", "weightedmean_tokens",
+                               "lasttoken") if config.get(f"pooling_mode_{mode}")]
+    supported = {"cls_token": "cls", "mean_tokens": "mean", "max_tokens": "max"}
+    if len(modes) != 1 or modes[0] not in supported:
+        raise ValueError(f"{hub_id} uses pooling {modes}; the ONNX backend supports exactly one of "
+                         f"{sorted(supported)} (use EMBEDDING_BACKEND=torch)")
+    return {"pooling": supported[modes[0]], "normalize": normalize, "max_seq_length": max_seq_length}
+
+
+class SentenceTransformerBackend:
+    """PyTorch embedding backend using sentence-transformers"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str, threads: int = 0):
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            import torch
+            torch.set_num_threads(threads)
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Embed a list of texts"""
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+class OnnxEmbeddingBackend:
+    """CPU embedding backend running the model as an int8-quantized ONNX Runtime graph
+
+    On first use the model is exported to ONNX with optimum, dynamically
+    quantized to int8 and cached under ONNX_MODEL_DIRECTORY. Token embeddings
+    are truncated, pooled and normalized the way the model's sentence-transformers
+    config says, so vectors match the torch backend.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, threads: int = 0):
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires onnxruntime and optimum to be installed") from e
+
+        self.model_name = model_name
+        model_dir = os.path.join(settings.ONNX_MODEL_DIRECTORY, model_name.replace("/", "__"))
+        export_path = os.path.join(model_dir, "export.json")
+        if not os.path.exists(export_path):
+            self._export_quantized(model_name, model_dir)
+        with open(export_path, "r", encoding="utf-8") as f:
+            export = json.load(f)
+        self.pooling = export["pooling"]
+        self.normalize = export["normalize"]
+        quantized_path = os.path.join(model_dir, "model_int8.onnx")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+
+        self.session = onnxruntime.InferenceSession(
+            quantized_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        # EMBEDDING_MAX_SEQ_LENGTH only applies to models that don't set their own limit
+        self.max_length = export.get("max_seq_length") or settings.EMBEDDING_MAX_SEQ_LENGTH
+
+    @staticmethod
+    def _export_quantized(model_name: str, model_dir: str):
+        """Export the model to ONNX and write an int8 dynamically-quantized copy
+
+        Several processes (bulk-import workers, API workers) may export at
+        once, so each exports into its own temporary directory and moves it
+        into place; export.json is written last and marks a complete export.
+        """
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        from transformers import AutoTokenizer
+
+        hub_id = _hub_model_id(model_name)
+        model_config = sentence_transformers_config(hub_id)
+        parent = os.path.dirname(os.path.abspath(model_dir))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(model_dir)}.")
+        try:
+            logger.info(f"Exporting {hub_id} to ONNX in {model_dir}...")
+            model = ORTModelForFeatureExtraction.from_pretrained(hub_id, export=True)
+            model.save_pretrained(tmp_dir)
+            AutoTokenizer.from_pretrained(hub_id).save_pretrained(tmp_dir)
+            quantize_dynamic(
+                os.path.join(tmp_dir, "model.onnx"),
+                os.path.join(tmp_dir, "model_int8.onnx"),
+                weight_type=QuantType.QInt8
+            )
+            with open(os.path.join(tmp_dir, "export.json"), "w", encoding="utf-8") as f:
+                json.dump({"model": hub_id, **model_config}, f)
+
+            if os.path.exists(model_dir) and not os.path.exists(os.path.join(model_dir, "export.json")):
+                # Incomplete export from an older version
+                shutil.rmtree(model_dir, ignore_errors=True)
+            try:
+                os.replace(tmp_dir, model_dir)
+                logger.info(f"Wrote int8 ONNX model to {model_dir}")
+            except OSError:
+                if not os.path.exists(os.path.join(model_dir, "export.json")):
+                    raise
+                logger.info(f"Another process exported {hub_id} first, using its copy")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Embed a list of texts"""
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            inputs = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+
+            batches.append(self._pool(token_embeddings, tokens["attention_mask"]))
+
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(batches)
+
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Pool token embeddings over the attention mask, then normalize if the model does"""
+        mask = attention_mask[..., None].astype(np.float32)
+        if self.pooling == "cls":
+            pooled = token_embeddings[:, 0]
+        elif self.pooling == "max":
+            pooled = np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        else:
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+
+EMBEDDING_BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxEmbeddingBackend.name: OnnxEmbeddingBackend,
+}
+
+
+def create_embedding_backend(model_name: str, backend: str = None, threads: int = None):
+    """Create the configured embedding backend for a model"""
+    backend = backend or settings.EMBEDDING_BACKEND
+    threads = settings.EMBEDDING_THREADS if threads is None else threads
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {sorted(EMBEDDING_BACKENDS)}")
+    return EMBEDDING_BACKENDS[backend](model_name, threads=threads)
@@ -1,48 +1,106 @@
 import time
+import json
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-import openai
-from sentence_transformers import SentenceTransformer
-import spacy
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, CancelledError, as_completed
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from ..utils.config import settings
-from ..utils.database import get_chroma_manager, get_neo4j_manager
-from ..models.schemas import QueryResponse, GraphContext, Entity, Relationship
+from .embeddings import create_embedding_backend
+from .communities import CommunityIndexer, is_global_query
+from ..utils.database import get_chroma_manager, get_neo4j_manager, get_lexical_index, get_embedding_cache, build_where_clause
+from ..utils.embedding_cache import content_hash
+from ..utils.lexical_index import reciprocal_rank_fusion
+from ..models.records import QueryResult, GraphContextRecord, EntityRecord, RelationshipRecord
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-openai.api_key = settings.OPENAI_API_KEY
+# Property keys that become record fields, or are internal bookkeeping (tenant
+# partition, community assignment, mention reference counts), rather than properties
+_ENTITY_FIELDS = frozenset(('id', 'name', 'type', 'tenant_id', 'community_id', 'community_dirty', 'mention_count'))
+_RELATIONSHIP_FIELDS = frozenset(('type',))
+
+def _properties_without(data: Dict[str, Any], fields: frozenset) -> Dict[str, Any]:
+    """A property map minus the keys stored as record fields"""
+    return {k: v for k, v in data.items() if k not in fields}
 
 class GraphRAGService:
     """Core Graph RAG service combining vector search and graph traversal"""
     
-    def __init__(self):
+    def __init__(self, connect_databases: bool = True):
+        # Models are loaded on first use, so processes that only write (or only embed) skip the other half
+        self._embedding_model = None
+        self._nlp = None
+        self._model_lock = threading.Lock()
+        
+        # Offline workers only prepare documents and never touch the stores
+        self.chroma_manager = get_chroma_manager() if connect_databases else None
+        self.neo4j_manager = get_neo4j_manager() if connect_databases else None
+        
+        # Vector search runs here while BM25 runs on the request's own thread;
+        # one thread per interactive request the admission lane lets through
+        self._retrieval_executor = ThreadPoolExecutor(max_workers=settings.ADMISSION_INTERACTIVE_CONCURRENCY,
+                                                      thread_name_prefix="retrieval")
+    
+    @property
+    def embedding_model(self):
+        """Embedding backend, loaded on first use"""
+        if self._embedding_model is None:
+            with self._model_lock:
+                if self._embedding_model is None:
+                    self._embedding_model = self._load_embedding_model()
+        return self._embedding_model
+    
+    @property
+    def nlp(self):
+        """spaCy pipeline for entity extraction, loaded on first use"""
+        if self._nlp is None:
+            with self._model_lock:
+                if self._nlp is None:
+                    self._nlp = self._load_nlp()
+        return self._nlp
+    
+    @staticmethod
+    def _load_embedding_model():
+        """Load the configured embedding backend, falling back to all-MiniLM-L6-v2"""
         try:
-            self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-            logger.info(f"Loaded embedding model: {settings.EMBEDDING_MODEL}")
+            embedding_model = create_embedding_backend(settings.EMBEDDING_MODEL)
+            logger.info(f"Loaded embedding model: {settings.EMBEDDING_MODEL} ({embedding_model.name} backend)")
+            return embedding_model
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             # Fallback to a simpler model
             try:
-                self.embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+                embedding_model = create_embedding_backend("all-MiniLM-L6-v2")
                 logger.info("Loaded fallback embedding model: all-MiniLM-L6-v2")
+                return embedding_model
             except Exception as e2:
                 logger.error(f"Failed to load fallback model: {e2}")
                 raise Exception("Could not load any embedding model")
-        
+    
+    @staticmethod
+    def _load_nlp():
+        """Load the spaCy model"""
         try:
-            self.nlp = spacy.load("en_core_web_sm")  # For entity extraction
+            # Imported here so importing the service (and the API) stays fast
+            import spacy
+            nlp = spacy.load("en_core_web_sm")  # For entity extraction
             logger.info("Loaded spaCy model: en_core_web_sm")
+            return nlp
         except Exception as e:
             logger.error(f"Failed to load spaCy model: {e}")
             raise Exception("Could not load spaCy model")
-        
-        self.chroma_manager = get_chroma_manager()
-        self.neo4j_manager = get_neo4j_manager()
     
-    def process_query(self, query: str, max_results: int = 5, include_graph_context: bool = True) -> QueryResponse:
-        """Process a user query using Graph RAG"""
+    def process_query(self, query: str, max_results: int = 5, include_graph_context: bool = True,
+                      filters: Optional[Dict[str, Any]] = None, tenant_id: Optional[str] = None,
+                      mode: str = "auto") -> QueryResult:
+        """Process a user query using Graph RAG, scoped to a tenant and pre-filtered by metadata
+        
+        Global questions (mode="global", or "auto" for corpus-wide phrasing
+        that names no entity) are answered from community summaries instead
+        of raw neighbourhoods.
+        """
         start_time = time.time()
         
         try:
@@ -50,35 +108,179 @@ class GraphRAGService:
             entities = self._extract_entities(query)
             logger.info(f"Extracted entities: {entities}")
             
+            if self._use_community_summaries(query, mode, entities, tenant_id):
+                query_embedding = self.embedding_model.encode([query]).tolist()[0]
+                summaries = self._community_search(query_embedding, tenant_id=tenant_id)
+                return self._answer_query(query, summaries, None, start_time)
+            
             # Step 2: Perform parallel retrieval
-            semantic_results = self._semantic_search(query, max_results)
+            where = build_where_clause(filters)
+            semantic_results = self._semantic_search(query, max_results, where=where, tenant_id=tenant_id)
             graph_context = None
             
             if include_graph_context and entities:
-                graph_context = self._graph_traversal(entities)
-            
-            # Step 3: Combine and format context
-            combined_context = self._combine_context(semantic_results, graph_context)
-            
-            # Step 4: Generate answer using LLM
-            answer = self._generate_answer(query, combined_context)
+                graph_context = self._graph_traversal(entities, tenant_id=tenant_id)
             
-            # Step 5: Calculate confidence and processing time
-            processing_time = time.time() - start_time
-            confidence_score = self._calculate_confidence(semantic_results, graph_context)
-            
-            return QueryResponse(
-                answer=answer,
-                sources=semantic_results,
-                graph_context=graph_context.dict() if graph_context else None,
-                confidence_score=confidence_score,
-                processing_time=processing_time
-            )
+            return self._answer_query(query, semantic_results, graph_context, start_time)
             
         except Exception as e:
             logger.error(f"Error processing query: {e}")
             raise
     
+    def _answer_query(self, query: str, semantic_results: List[Dict[str, Any]], graph_context: Optional[GraphContextRecord],
+                      start_time: float) -> QueryResult:
+        """Generate the answer for a query whose retrieval has finished"""
+        # Step 3: Combine and format context
+        combined_context = self._combine_context(semantic_results, graph_context)
+        
+        # Step 4: Generate answer using LLM
+        answer = self._generate_answer(query, combined_context)
+        
+        # Step 5: Calculate confidence and processing time
+        processing_time = time.time() - start_time
+        confidence_score = self._calculate_confidence(semantic_results, graph_context)
+        
+        return QueryResult(
+            answer=answer,
+            sources=semantic_results,
+            graph_context=graph_context,
+            confidence_score=confidence_score,
+            processing_time=processing_time
+        )
+    
+    def process_queries(self, requests: List[Dict[str, Any]], max_concurrency: Optional[int] = None,
+                        cancel: Optional[threading.Event] = None) -> Iterator[Tuple[int, Any]]:
+        """Process a batch of queries, yielding (index, QueryResult or Exception) as each finishes
+        
+        Each request is a dict of process_query keyword arguments. Retrieval is
+        vectorised across the batch: entities come from one nlp.pipe pass,
+        embeddings from one encode call, vector search from one multi-query
+        ChromaDB call per (tenant, filters) group and entity lookups from one
+        Neo4j query per tenant. LLM calls then run with bounded concurrency.
+        
+        Setting ``cancel`` (e.g. when the client has gone away) stops the
+        batch: queued LLM calls are skipped and only those already running
+        finish.
+        """
+        start_time = time.time()
+        queries = [request['query'] for request in requests]
+        
+        try:
+            # Embeddings and entities for the whole batch; global questions skip local retrieval
+            query_embeddings = self.embedding_model.encode(queries).tolist()
+            entities = self._extract_entities_batch(queries)
+            is_global = [
+                self._use_community_summaries(request['query'], request.get('mode', 'auto'), entities[i],
+                                              request.get('tenant_id'))
+                for i, request in enumerate(requests)
+            ]
+            local = [i for i, flag in enumerate(is_global) if not flag]
+            
+            semantic_results: List[List[Dict[str, Any]]] = [[] for _ in requests]
+            graph_contexts: List[Optional[GraphContextRecord]] = [None for _ in requests]
+            for i in range(len(requests)):
+                if is_global[i]:
+                    semantic_results[i] = self._community_search(query_embeddings[i], tenant_id=requests[i].get('tenant_id'))
+            
+            if local:
+                local_requests = [requests[i] for i in local]
+                local_entities = [entities[i] for i in local]
+                local_results = self._semantic_search_batch(local_requests, [query_embeddings[i] for i in local])
+                local_contexts = self._graph_traversal_batch(local_requests, local_entities)
+                for position, i in enumerate(local):
+                    semantic_results[i] = local_results[position]
+                    graph_contexts[i] = local_contexts[position]
+        except Exception as e:
+            logger.error(f"Error in batch retrieval: {e}")
+            for i in range(len(requests)):
+                yield i, e
+            return
+        
+        def answer(i: int) -> QueryResult:
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            return self._answer_query(queries[i], semantic_results[i], graph_contexts[i], start_time)
+        
+        executor = ThreadPoolExecutor(max_workers=max_concurrency or settings.BATCH_QUERY_LLM_CONCURRENCY,
+                                      thread_name_prefix="batch-llm")
+        try:
+            futures = {executor.submit(answer, i): i for i in range(len(queries))}
+            for future in as_completed(futures):
+                if cancel is not None and cancel.is_set():
+                    return
+                index = futures[future]
+                try:
+                    yield index, future.result()
+                except Exception as e:
+                    logger.error(f"Error processing batch query {index}: {e}")
+                    yield index, e
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _semantic_search_batch(self, requests: List[Dict[str, Any]], query_embeddings: List[List[float]]) -> List[List[Dict[str, Any]]]:
+        """Hybrid search for a batch, with one multi-query ChromaDB call per (tenant, filters) group"""
+        results: List[List[Dict[str, Any]]] = [[] for _ in requests]
+        
+        groups: Dict[Tuple[Optional[str], str], List[int]] = defaultdict(list)
+        for i, request in enumerate(requests):
+            filters_key = json.dumps(request.get('filters'), sort_keys=True, default=str)
+            groups[(request.get('tenant_id'), filters_key)].append(i)
+        
+        for (tenant_id, _), indexes in groups.items():
+            try:
+                where = build_where_clause(requests[indexes[0]].get('filters'))
+                lexical_index = get_lexical_index(tenant_id)
+                max_results = {i: requests[i].get('max_results', 5) for i in indexes}
+                # Fetch a deeper candidate list when fusing with BM25, as in _semantic_search
+                depth = max(max_results.values()) * (2 if lexical_index is not None else 1)
+                
+                chroma_results = self.chroma_manager.query(
+                    query_embeddings=[query_embeddings[i] for i in indexes],
+                    n_results=depth,
+                    where=where,
+                    tenant_id=tenant_id
+                )
+                
+                for position, i in enumerate(indexes):
+                    vector_results = self._format_chroma_results(chroma_results, position)
+                    if lexical_index is None:
+                        results[i] = vector_results[:max_results[i]]
+                    else:
+                        lexical_hits = lexical_index.search(requests[i]['query'], max_results[i] * 2)
+                        results[i] = self._fuse_results(vector_results[:max_results[i] * 2], lexical_hits, max_results[i],
+                                                        where=where, tenant_id=tenant_id)
+            except Exception as e:
+                logger.error(f"Error in batch semantic search: {e}")
+        
+        return results
+    
+    def _graph_traversal_batch(self, requests: List[Dict[str, Any]], query_entities: List[List[str]]) -> List[Optional[GraphContextRecord]]:
+        """Graph context for a batch, with one Neo4j lookup per tenant for all queries' entities"""
+        contexts: List[Optional[GraphContextRecord]] = [None for _ in requests]
+        
+        by_tenant: Dict[Optional[str], List[int]] = defaultdict(list)
+        for i, request in enumerate(requests):
+            if request.get('include_graph_context', True) and query_entities[i]:
+                by_tenant[request.get('tenant_id')].append(i)
+        
+        for tenant_id, indexes in by_tenant.items():
+            try:
+                names = sorted({name for i in indexes for name in query_entities[i]})
+                graph_data = self.neo4j_manager.query_entities(names, tenant_id=tenant_id)
+                
+                rows_by_name: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+                for record in graph_data:
+                    if record.get('e'):
+                        rows_by_name[record['e'].get('name', '')].append(record)
+                
+                for i in indexes:
+                    rows = [record for name in dict.fromkeys(query_entities[i]) for record in rows_by_name.get(name, [])]
+                    contexts[i] = self._build_graph_context(rows)
+            except Exception as e:
+                logger.error(f"Error in batch graph traversal: {e}")
+        
+        return contexts
+    
     def _extract_entities(self, text: str) -> List[str]:
         """Extract named entities from text using spaCy"""
         try:
@@ -89,85 +291,197 @@ class GraphRAGService:
             logger.error(f"Error extracting entities: {e}")
             return []
     
-    def _semantic_search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+    def _extract_entities_batch(self, texts: List[str]) -> List[List[str]]:
+        """Extract named entities from many texts with spaCy's batched pipe"""
+        try:
+            return [[ent.text for ent in doc.ents] for doc in self.nlp.pipe(texts, batch_size=settings.SPACY_BATCH_SIZE)]
+        except Exception as e:
+            logger.error(f"Error extracting entities: {e}")
+            return [[] for _ in texts]
+    
+    def _semantic_search(self, query: str, max_results: int, where: Optional[Dict[str, Any]] = None,
+                         tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Perform hybrid search: ChromaDB and BM25 in parallel, fused with reciprocal-rank fusion"""
+        lexical_index = get_lexical_index(tenant_id)
+        if lexical_index is None:
+            return self._vector_search(query, max_results, where=where, tenant_id=tenant_id)
+        
+        try:
+            # Fetch a deeper candidate list from each retriever so fusion has something to re-rank
+            candidates = max_results * 2
+            vector_future = self._retrieval_executor.submit(self._vector_search, query, candidates, where, tenant_id)
+            lexical_hits = lexical_index.search(query, candidates)
+            vector_results = vector_future.result()
+            
+            return self._fuse_results(vector_results, lexical_hits, max_results, where=where, tenant_id=tenant_id)
+            
+        except Exception as e:
+            logger.error(f"Error in hybrid search: {e}")
+            return []
+    
+    def _vector_search(self, query: str, max_results: int, where: Optional[Dict[str, Any]] = None,
+                       tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Perform semantic search using ChromaDB"""
         try:
             # Get embeddings for query
             query_embedding = self.embedding_model.encode([query])
             
             # Search in ChromaDB
-            results = self.chroma_manager.query([query], n_results=max_results)
-            
-            # Format results
-            formatted_results = []
-            if results['documents'] and results['documents'][0]:
-                for i, doc in enumerate(results['documents'][0]):
-                    formatted_results.append({
-                        'content': doc,
-                        'metadata': results['metadatas'][0][i] if results['metadatas'] and results['metadatas'][0] else {},
-                        'distance': results['distances'][0][i] if results['distances'] and results['distances'][0] else 0
-                    })
+            results = self.chroma_manager.query(
+                query_embeddings=query_embedding.tolist(),
+                n_results=max_results,
+                where=where,
+                tenant_id=tenant_id
+            )
             
-            return formatted_results
+            return self._format_chroma_results(results, 0)
             
         except Exception as e:
             logger.error(f"Error in semantic search: {e}")
             return []
     
-    def _graph_traversal(self, entities: List[str]) -> Optional[GraphContext]:
-        """Traverse the knowledge graph starting from extracted entities"""
+    @staticmethod
+    def _format_chroma_results(results: Dict[str, Any], q: int) -> List[Dict[str, Any]]:
+        """Format the q-th query's hits from a ChromaDB query result"""
+        formatted_results = []
+        if results['documents'] and results['documents'][q]:
+            for i, doc in enumerate(results['documents'][q]):
+                formatted_results.append({
+                    'id': results['ids'][q][i],
+                    'content': doc,
+                    'metadata': results['metadatas'][q][i] if results['metadatas'] and results['metadatas'][q] else {},
+                    'distance': results['distances'][q][i] if results['distances'] and results['distances'][q] else 0
+                })
+        return formatted_results
+    
+    def _fuse_results(self, vector_results: List[Dict[str, Any]], lexical_hits: List[Tuple[str, float]], max_results: int,
+                      where: Optional[Dict[str, Any]] = None, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Merge vector and BM25 rankings with reciprocal-rank fusion"""
+        by_id = {r['id']: r for r in vector_results}
+        bm25_scores = dict(lexical_hits)
+        
+        if where and lexical_hits:
+            # The BM25 index has no metadata, so apply the filter to its hits before fusing
+            self._fetch_documents([doc_id for doc_id, _ in lexical_hits], by_id, where=where, tenant_id=tenant_id)
+            lexical_hits = [(doc_id, score) for doc_id, score in lexical_hits if doc_id in by_id]
+        
+        fused = reciprocal_rank_fusion(
+            [[r['id'] for r in vector_results], [doc_id for doc_id, _ in lexical_hits]],
+            k=settings.RRF_K
+        )[:max_results]
+        
+        # Documents only found lexically still need their content from ChromaDB
+        missing_ids = [doc_id for doc_id, _ in fused if doc_id not in by_id]
+        if missing_ids:
+            self._fetch_documents(missing_ids, by_id, tenant_id=tenant_id)
+        
+        formatted_results = []
+        for doc_id, rrf_score in fused:
+            if doc_id not in by_id:
+                continue
+            result = dict(by_id[doc_id])
+            result['rrf_score'] = rrf_score
+            if doc_id in bm25_scores:
+                result['bm25_score'] = bm25_scores[doc_id]
+            formatted_results.append(result)
+        
+        return formatted_results
+    
+    def _fetch_documents(self, ids: List[str], by_id: Dict[str, Dict[str, Any]], where: Optional[Dict[str, Any]] = None,
+                         tenant_id: Optional[str] = None):
+        """Fetch documents not yet in by_id from ChromaDB and add them to it"""
+        ids = [doc_id for doc_id in ids if doc_id not in by_id]
+        if not ids:
+            return
+        fetched = self.chroma_manager.get_documents(ids, where=where, tenant_id=tenant_id)
+        for i, doc_id in enumerate(fetched['ids']):
+            by_id[doc_id] = {
+                'id': doc_id,
+                'content': fetched['documents'][i],
+                'metadata': fetched['metadatas'][i] if fetched['metadatas'] else {}
+            }
+    
+    def _use_community_summaries(self, query: str, mode: str, entities: List[str],
+                                 tenant_id: Optional[str] = None) -> bool:
+        """Whether a query should be answered from community summaries"""
+        if mode == "global":
+            return True
+        if mode != "auto" or not is_global_query(query, entities):
+            return False
+        # Fall back to local retrieval until communities have been built for the tenant
+        try:
+            return self.chroma_manager.count_communities(tenant_id) > 0
+        except Exception as e:
+            logger.error(f"Error checking community summaries: {e}")
+            return False
+    
+    def _community_search(self, query_embedding: List[float], tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Find the community summaries most relevant to a query"""
+        try:
+            results = self.chroma_manager.query_communities(
+                query_embeddings=[query_embedding],
+                n_results=settings.COMMUNITY_GLOBAL_TOP_K,
+                tenant_id=tenant_id
+            )
+            return self._format_chroma_results(results, 0)
+        except Exception as e:
+            logger.error(f"Error in community search: {e}")
+            return []
+    
+    def refresh_communities(self, tenant_id: Optional[str] = None, full: bool = False) -> Dict[str, Any]:
+        """Recompute the tenant's communities touched since the last refresh and re-index their summaries"""
+        indexer = CommunityIndexer(lambda texts: self.embedding_model.encode(texts).tolist())
+        return indexer.refresh(tenant_id=tenant_id, full=full)
+    
+    def _graph_traversal(self, entities: List[str], tenant_id: Optional[str] = None) -> Optional[GraphContextRecord]:
+        """Traverse the tenant's knowledge graph starting from extracted entities"""
         try:
             if not entities:
                 return None
             
             # Query Neo4j for entities and their relationships
-            graph_data = self.neo4j_manager.query_entities(entities)
+            graph_data = self.neo4j_manager.query_entities(entities, tenant_id=tenant_id)
+            return self._build_graph_context(graph_data)
             
-            # Extract entities and relationships
-            found_entities = []
+        except Exception as e:
+            logger.error(f"Error in graph traversal: {e}")
+            return None
+    
+    def _build_graph_context(self, graph_data: List[Dict[str, Any]]) -> Optional[GraphContextRecord]:
+        """Build a GraphContextRecord from query_entities rows
+        
+        Plain slotted records instead of pydantic models: contexts can hold
+        thousands of rows, and the response is serialised without re-validation.
+        """
+        try:
+            found_entities: Dict[str, EntityRecord] = {}
             found_relationships = []
-            seen_entities = set()
             
             for record in graph_data:
-                # Extract source entity
-                if 'e' in record and record['e']:
-                    entity_data = record['e']
-                    entity_id = entity_data.get('id', '')
-                    if entity_id not in seen_entities:
-                        found_entities.append(Entity(
-                            id=entity_id,
-                            name=entity_data.get('name', ''),
-                            type=entity_data.get('type', ''),
-                            properties={k: v for k, v in entity_data.items() if k not in ['id', 'name', 'type']}
-                        ))
-                        seen_entities.add(entity_id)
+                entity_data = record.get('e')
+                if not entity_data:
+                    continue
+                entity_id = entity_data.get('id', '')
+                if entity_id not in found_entities:
+                    found_entities[entity_id] = self._entity_record(entity_data)
                 
-                # Extract related entity and relationship
-                if 'related' in record and record['related'] and 'r' in record and record['r']:
-                    related_data = record['related']
-                    rel_data = record['r']
-                    
-                    # Add related entity
+                # Extract related entity and relationship (r is the relationship's property map)
+                related_data = record.get('related')
+                rel_data = record.get('r')
+                if related_data and rel_data is not None:
                     related_id = related_data.get('id', '')
-                    if related_id not in seen_entities:
-                        found_entities.append(Entity(
-                            id=related_id,
-                            name=related_data.get('name', ''),
-                            type=related_data.get('type', ''),
-                            properties={k: v for k, v in related_data.items() if k not in ['id', 'name', 'type']}
-                        ))
-                        seen_entities.add(related_id)
+                    if related_id not in found_entities:
+                        found_entities[related_id] = self._entity_record(related_data)
                     
-                    # Add relationship
-                    found_relationships.append(Relationship(
-                        source_id=entity_data.get('id', ''),
+                    found_relationships.append(RelationshipRecord(
+                        source_id=entity_id,
                         target_id=related_id,
                         relationship_type=rel_data.get('type', 'RELATES_TO'),
-                        properties={k: v for k, v in rel_data.items() if k not in ['type']}
+                        properties=_properties_without(rel_data, _RELATIONSHIP_FIELDS)
                     ))
             
-            return GraphContext(
-                entities=found_entities,
+            return GraphContextRecord(
+                entities=list(found_entities.values()),
                 relationships=found_relationships
             )
             
@@ -175,14 +489,32 @@ class GraphRAGService:
             logger.error(f"Error in graph traversal: {e}")
             return None
     
-    def _combine_context(self, semantic_results: List[Dict[str, Any]], graph_context: Optional[GraphContext]) -> str:
+    @staticmethod
+    def _entity_record(data: Dict[str, Any]) -> EntityRecord:
+        """EntityRecord from a node's property map"""
+        return EntityRecord(
+            id=data.get('id', ''),
+            name=data.get('name', ''),
+            type=data.get('type', ''),
+            properties=_properties_without(data, _ENTITY_FIELDS)
+        )
+    
+    def _combine_context(self, semantic_results: List[Dict[str, Any]], graph_context: Optional[GraphContextRecord]) -> str:
         """Combine semantic search results and graph context into a single context string"""
         context_parts = []
         
+        # Community summaries stand in for documents when answering global questions
+        summaries = [r for r in semantic_results if r.get('metadata', {}).get('source_type') == 'community']
+        documents = [r for r in semantic_results if r.get('metadata', {}).get('source_type') != 'community']
+        if summaries:
+            context_parts.append("## Community Summaries:")
+            for i, result in enumerate(summaries, 1):
+                context_parts.append(f"{i}. {result['content']}")
+        
         # Add semantic search results
-        if semantic_results:
+        if documents:
             context_parts.append("## Relevant Documents:")
-            for i, result in enumerate(semantic_results, 1):
+            for i, result in enumerate(documents, 1):
                 context_parts.append(f"{i}. {result['content']}")
                 if result.get('metadata'):
                     context_parts.append(f"   Metadata: {result['metadata']}")
@@ -213,6 +545,9 @@ class GraphRAGService:
     def _generate_answer(self, query: str, context: str) -> str:
         """Generate answer using OpenAI API"""
         try:
+            import openai
+            openai.api_key = settings.OPENAI_API_KEY
+            
             prompt = f"""
 You are a helpful AI assistant with access to both document content and knowledge graph relationships. 
 Please answer the user's question based on the provided context.
@@ -247,14 +582,15 @@ Answer:
             logger.error(f"Error generating answer: {e}")
             return f"I apologize, but I encountered an error while generating the answer: {str(e)}"
     
-    def _calculate_confidence(self, semantic_results: List[Dict[str, Any]], graph_context: Optional[GraphContext]) -> float:
+    def _calculate_confidence(self, semantic_results: List[Dict[str, Any]], graph_context: Optional[GraphContextRecord]) -> float:
         """Calculate confidence score based on available information"""
         confidence = 0.0
         
-        # Base confidence from semantic search
-        if semantic_results:
+        # Base confidence from semantic search (lexical-only hits carry no vector distance)
+        distances = [r['distance'] for r in semantic_results if 'distance' in r]
+        if distances:
             # Average distance (lower is better, so we invert)
-            avg_distance = sum(r.get('distance', 1.0) for r in semantic_results) / len(semantic_results)
+            avg_distance = sum(distances) / len(distances)
             confidence += (1.0 - avg_distance) * 0.6  # 60% weight for semantic search
         
         # Additional confidence from graph context
@@ -263,34 +599,198 @@ Answer:
         
         return min(confidence, 1.0)  # Cap at 1.0
     
-    def add_document(self, content: str, metadata: Dict[str, Any] = None) -> str:
-        """Add a document to the system and extract entities for the graph"""
+    def _embed_documents(self, contents: List[str], hashes: List[str]) -> List[List[float]]:
+        """Embed document contents, reusing cached vectors keyed by (model, content hash)"""
+        cache = get_embedding_cache()
+        if cache is None:
+            return self.embedding_model.encode(contents).tolist()
+        
+        model_key = f"{self.embedding_model.model_name}@{self.embedding_model.name}"
+        cached = cache.get_many(model_key, hashes)
+        missing = [i for i, digest in enumerate(hashes) if digest not in cached]
+        if missing:
+            vectors = self.embedding_model.encode([contents[i] for i in missing])
+            new_entries = {hashes[i]: vector for i, vector in zip(missing, vectors)}
+            cache.put_many(model_key, new_entries)
+            cached.update(new_entries)
+        
+        return [cached[digest].tolist() for digest in hashes]
+    
+    @staticmethod
+    def _entity_id(name: str, tenant_id: Optional[str] = None) -> str:
+        """Stable entity ID, so re-ingesting after a restart merges into the same node"""
+        key = f"{tenant_id}\x00{name}" if tenant_id else name
+        return f"entity_{content_hash(key)[:16]}"
+    
+    @staticmethod
+    def _document_key(doc_id: str, tenant_id: Optional[str] = None) -> str:
+        """Graph key of a document (content-hash IDs repeat across tenants)"""
+        return f"{tenant_id}/{doc_id}" if tenant_id else doc_id
+    
+    def add_document(self, content: str, metadata: Dict[str, Any] = None, tenant_id: Optional[str] = None) -> str:
+        """Add a document to the tenant's collection and extract entities for its graph partition
+        
+        Documents are keyed by content hash, so re-uploading unchanged content
+        skips embedding and graph extraction and returns the existing ID. If
+        only the metadata changed, it is updated in place.
+        """
+        return self.add_documents([(content, metadata)], tenant_id=tenant_id)[0]
+    
+    def add_documents(self, documents: List[Tuple[str, Optional[Dict[str, Any]]]], tenant_id: Optional[str] = None) -> List[str]:
+        """Add a batch of (content, metadata) documents, returning their IDs in order"""
         try:
-            # Generate document ID
-            import uuid
-            doc_id = str(uuid.uuid4())
-            
-            # Add to ChromaDB
-            self.chroma_manager.add_documents(
-                documents=[content],
-                metadatas=[metadata or {}],
-                ids=[doc_id]
-            )
+            new_documents = self.filter_new_documents(documents, tenant_id=tenant_id)
+            if new_documents:
+                contents = [doc['content'] for doc in new_documents]
+                embeddings, entities = self.prepare_documents(contents, [doc['hash'] for doc in new_documents])
+                self.write_documents(new_documents, embeddings, entities, tenant_id=tenant_id)
             
-            # Extract entities and add to graph
-            entities = self._extract_entities(content)
-            for entity in entities:
-                # Create entity in Neo4j
-                entity_id = f"entity_{hash(entity) % 1000000}"
-                self.neo4j_manager.create_entity(
-                    entity_id=entity_id,
-                    name=entity,
-                    entity_type="GENERAL"  # Could be enhanced with entity classification
-                )
+            return [f"doc_{content_hash(content)}" for content, _ in documents]
             
-            logger.info(f"Added document {doc_id} with {len(entities)} entities")
-            return doc_id
+        except Exception as e:
+            logger.error(f"Error adding documents: {e}")
+            raise
+    
+    def filter_new_documents(self, documents: List[Tuple[str, Optional[Dict[str, Any]]]],
+                             tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Hash documents and drop the ones already stored
+        
+        Existing documents whose metadata changed are updated in place. Returns
+        dicts with id, hash, content and metadata for the documents that still
+        need embedding and graph extraction, de-duplicated within the batch.
+        """
+        candidates: Dict[str, Dict[str, Any]] = {}
+        for content, metadata in documents:
+            digest = content_hash(content)
+            doc_id = f"doc_{digest}"
+            if doc_id not in candidates:
+                candidates[doc_id] = {'id': doc_id, 'hash': digest, 'content': content, 'metadata': metadata or {}}
+        
+        existing = self.chroma_manager.get_documents(list(candidates), tenant_id=tenant_id)
+        changed_ids, changed_metadatas = [], []
+        for i, doc_id in enumerate(existing['ids']):
+            existing_metadata = (existing['metadatas'][i] if existing['metadatas'] else None) or {}
+            candidate = candidates.pop(doc_id)
+            if existing_metadata != candidate['metadata']:
+                changed_ids.append(doc_id)
+                changed_metadatas.append(candidate['metadata'])
+        
+        if changed_ids:
+            self.chroma_manager.update_metadatas(changed_ids, changed_metadatas, tenant_id=tenant_id)
+        skipped = len(existing['ids'])
+        if skipped:
+            logger.info(f"Skipped {skipped} unchanged documents ({len(changed_ids)} metadata updates)")
+        
+        return list(candidates.values())
+    
+    def prepare_documents(self, contents: List[str], hashes: List[str]) -> Tuple[List[List[float]], List[List[str]]]:
+        """CPU-heavy half of ingest: embed contents and extract their entities
+        
+        Needs no database connection, so bulk imports can run it in worker processes.
+        """
+        embeddings = self._embed_documents(contents, hashes)
+        entities = self._extract_entities_batch(contents)
+        return embeddings, entities
+    
+    def write_documents(self, documents: List[Dict[str, Any]], embeddings: List[List[float]], entities: List[List[str]],
+                        tenant_id: Optional[str] = None):
+        """Write prepared documents to Neo4j, the BM25 index and ChromaDB in bulk
+        
+        ChromaDB is written last and is the commit marker: filter_new_documents
+        only skips documents it finds there, so a batch that fails part-way is
+        retried in full. The graph and BM25 writes are idempotent for that.
+        """
+        ids = [doc['id'] for doc in documents]
+        contents = [doc['content'] for doc in documents]
+        
+        # Add every document's entity mentions to the graph in one transaction
+        graph_documents = [
+            {
+                "key": self._document_key(doc_id, tenant_id),
+                "entities": [
+                    {
+                        "id": self._entity_id(entity, tenant_id),
+                        "name": entity,
+                        "type": "GENERAL",  # Could be enhanced with entity classification
+                        "count": count
+                    }
+                    for entity, count in Counter(doc_entities).items()
+                ]
+            }
+            for doc_id, doc_entities in zip(ids, entities)
+        ]
+        self.neo4j_manager.add_document_mentions(graph_documents, tenant_id=tenant_id)
+        
+        lexical_index = get_lexical_index(tenant_id)
+        if lexical_index is not None:
+            # Drop postings left by an earlier attempt that failed before the ChromaDB write
+            lexical_index.delete(ids)
+            lexical_index.add_many(list(zip(ids, contents)))
+        
+        # Add to ChromaDB
+        self.chroma_manager.add_documents(
+            documents=contents,
+            embeddings=embeddings,
+            metadatas=[doc['metadata'] for doc in documents],
+            ids=ids,
+            tenant_id=tenant_id
+        )
+        
+        logger.info(f"Added {len(ids)} documents with {sum(len(e) for e in entities)} entity mentions")
+    
+    def delete_document(self, doc_id: str, tenant_id: Optional[str] = None) -> bool:
+        """Remove a document's vectors, lexical postings and graph mentions
+        
+        Returns False if the document does not exist.
+        """
+        try:
+            existing = self.chroma_manager.get_documents([doc_id], tenant_id=tenant_id)
+            if not existing['ids']:
+                return False
             
+            # ChromaDB is the commit marker (see write_documents), so it goes last:
+            # a failure part-way leaves the document listed and the delete retryable
+            self.neo4j_manager.remove_document(self._document_key(doc_id, tenant_id))
+            
+            lexical_index = get_lexical_index(tenant_id)
+            if lexical_index is not None:
+                lexical_index.delete([doc_id])
+            
+            self.chroma_manager.delete_documents([doc_id], tenant_id=tenant_id)
+            
+            logger.info(f"Deleted document {doc_id}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error deleting document: {e}")
+            raise
+    
+    def update_document(self, doc_id: str, content: str, metadata: Dict[str, Any] = None,
+                        tenant_id: Optional[str] = None) -> Optional[str]:
+        """Replace a document's content and metadata, returning its new ID
+        
+        Returns None if the document does not exist. Unchanged content only
+        updates metadata; new content is re-ingested under its new hash and
+        the old document is deleted.
+        """
+        try:
+            existing = self.chroma_manager.get_documents([doc_id], tenant_id=tenant_id)
+            if not existing['ids']:
+                return None
+            
+            new_id = self.add_document(content, metadata, tenant_id=tenant_id)
+            if new_id != doc_id:
+                self.delete_document(doc_id, tenant_id=tenant_id)
+            return new_id
+            
+        except Exception as e:
+            logger.error(f"Error updating document: {e}")
+            raise
+    
+    def compact_if_needed(self, tenant_id: Optional[str] = None):
+        """Rebuild the tenant's ChromaDB collection once enough documents were deleted"""
+        try:
+            if self.chroma_manager.needs_compaction(tenant_id):
+                self.chroma_manager.compact_collection(tenant_id)
         except Exception as e:
-            logger.error(f"Error adding document: {e}")
-            raise 
\ No newline at end of file
+            logger.error(f"Error compacting collection: {e}")
@@ -0,0 +1,416 @@
+"""
+Snapshot and fast restore of the combined vector and graph state.
+
+`create` writes every ChromaDB collection (embeddings as float16 or float32
+arrays, ids, documents and metadata) and the Neo4j graph (Entity, Document
+and Community nodes with their MENTIONS and RELATES_TO relationships) to a
+single versioned, memory-mappable archive (see utils/snapshot_archive.py).
+Store counts are compared before and after reading; if documents were
+written meanwhile the snapshot is discarded, so pause ingestion or snapshot
+a replica.
+
+`restore` bulk-loads an archive into empty stores before the API starts.
+Stored embeddings go straight into ChromaDB and the graph is recreated with
+batched UNWIND writes, so no model inference or entity extraction is
+repeated. ChromaDB and Neo4j are restored concurrently, and the BM25 indexes
+are rebuilt from the restored collections.
+
+Both commands report records/s and MB/s per section.
+
+Usage (from backend/):
+
+    python -m app.snapshot create ./data/snapshots/graph_rag.snap
+    python -m app.snapshot create ./data/snapshots/graph_rag.snap --dtype float32
+    python -m app.snapshot info ./data/snapshots/graph_rag.snap --verify
+    python -m app.snapshot restore ./data/snapshots/graph_rag.snap
+"""
+import sys
+import time
+import argparse
+import logging
+from datetime import datetime, date, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from .utils.config import settings
+from .utils.database import (
+    initialize_databases, close_databases, get_chroma_manager, get_neo4j_manager,
+    get_lexical_index, reset_lexical_index, tenant_collection_name, is_compaction_collection
+)
+from .utils.snapshot_archive import SnapshotWriter, SnapshotReader, iter_sections
+
+logger = logging.getLogger(__name__)
+
+# Node labels with the property their index looks them up by, and relationship types with their endpoints
+GRAPH_NODES = {"Entity": "id", "Document": "key", "Community": "id"}
+GRAPH_RELATIONSHIPS = [("MENTIONS", "Document", "Entity"), ("RELATES_TO", "Entity", "Entity")]
+
+MB = 1024 * 1024
+
+
+def _phase(section: str, records: int, nbytes: int, started: float) -> Dict[str, Any]:
+    return {"section": section, "records": records, "bytes": nbytes, "seconds": time.perf_counter() - started}
+
+
+def report(command: str, phase: Dict[str, Any]):
+    """Print one section's throughput"""
+    seconds = max(phase["seconds"], 1e-9)
+    rate = f" | {phase['records'] / seconds:.0f} records/s" if phase["records"] else ""
+    print(f"[{command}] {phase['section']}: {phase['records']} records, {phase['bytes'] / MB:.1f} MB "
+          f"in {phase['seconds']:.2f}s{rate} | {phase['bytes'] / MB / seconds:.1f} MB/s", file=sys.stderr)
+
+
+def _section_bytes(sections: Dict[str, Any]) -> int:
+    return sum(section["length"] for _, section in iter_sections(sections))
+
+
+def _encode_property(value):
+    """orjson fallback for Neo4j temporal values, tagged so restore can turn them back into temporals"""
+    native = value.to_native() if hasattr(value, "to_native") else None
+    if isinstance(native, datetime):
+        return {"$datetime": native.isoformat()}
+    if isinstance(native, date):
+        return {"$date": native.isoformat()}
+    raise TypeError(f"Cannot snapshot property value {value!r}")
+
+
+def _decode_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn tagged temporal values back into datetimes (the driver sends them as Neo4j temporals)"""
+    for key, value in properties.items():
+        if isinstance(value, dict):
+            if "$datetime" in value:
+                properties[key] = datetime.fromisoformat(value["$datetime"])
+            elif "$date" in value:
+                properties[key] = date.fromisoformat(value["$date"])
+    return properties
+
+
+def store_counts(chroma, neo4j) -> Dict[str, Any]:
+    """Record counts of every collection and of the graph"""
+    return {
+        "collections": {name: chroma.count_records(name) for name, _ in chroma.list_collections()},
+        "graph": neo4j.get_graph_counts()
+    }
+
+
+def document_tenants(collections: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """Tenants whose document collections are in a snapshot (None for the default collection)"""
+    tenants = []
+    for collection in collections:
+        tenant_id = (collection["metadata"] or {}).get("tenant_id")
+        if collection["name"] == tenant_collection_name(tenant_id):
+            tenants.append(tenant_id)
+    return tenants
+
+
+def snapshot_collection(writer: SnapshotWriter, chroma, name: str, metadata: Optional[Dict[str, Any]],
+                        dtype: str, batch_size: int):
+    """Copy one collection into the archive; returns its manifest entry and throughput"""
+    started = time.perf_counter()
+    ids = writer.string_column()
+    documents = writer.string_column()
+    metadatas = writer.string_column()
+    embeddings = writer.column(dtype)
+    for batch in chroma.iter_records(name, batch_size):
+        ids.append_strings(batch["ids"])
+        documents.append_strings(batch["documents"])
+        metadatas.append_json(batch["metadatas"])
+        embeddings.append(np.asarray(batch["embeddings"], dtype=np.float32))
+
+    count = len(ids)
+    sections = {
+        "ids": writer.write_column(ids),
+        "documents": writer.write_column(documents),
+        "metadatas": writer.write_column(metadatas),
+        "embeddings": writer.write_column(embeddings)
+    }
+    entry = {"name": name, "metadata": metadata, "count": count, "sections": sections}
+    return entry, _phase(f"collection {name}", count, _section_bytes(sections), started)
+
+
+def snapshot_graph(writer: SnapshotWriter, neo4j, batch_size: int, command: str) -> Dict[str, Any]:
+    """Copy the graph's nodes and relationships into the archive"""
+    nodes = []
+    for label, key in GRAPH_NODES.items():
+        started = time.perf_counter()
+        properties = writer.string_column()
+        for batch in neo4j.iter_nodes(label, batch_size):
+            properties.append_json(batch, default=_encode_property)
+        count = len(properties)
+        sections = {"properties": writer.write_column(properties)}
+        nodes.append({"label": label, "key": key, "count": count, "sections": sections})
+        report(command, _phase(f"nodes :{label}", count, _section_bytes(sections), started))
+
+    relationships = []
+    for rel_type, start_label, end_label in GRAPH_RELATIONSHIPS:
+        started = time.perf_counter()
+        starts = writer.string_column()
+        ends = writer.string_column()
+        properties = writer.string_column()
+        for batch in neo4j.iter_relationships(rel_type, start_label, GRAPH_NODES[start_label],
+                                              end_label, GRAPH_NODES[end_label], batch_size):
+            starts.append_strings([start for start, _, _ in batch])
+            ends.append_strings([end for _, end, _ in batch])
+            properties.append_json([props for _, _, props in batch], default=_encode_property)
+        count = len(starts)
+        sections = {
+            "starts": writer.write_column(starts),
+            "ends": writer.write_column(ends),
+            "properties": writer.write_column(properties)
+        }
+        relationships.append({
+            "type": rel_type, "start_label": start_label, "start_key": GRAPH_NODES[start_label],
+            "end_label": end_label, "end_key": GRAPH_NODES[end_label], "count": count, "sections": sections
+        })
+        report(command, _phase(f"relationships [:{rel_type}]", count, _section_bytes(sections), started))
+
+    return {"nodes": nodes, "relationships": relationships}
+
+
+def create(args) -> Dict[str, Any]:
+    """Write a snapshot of both stores"""
+    if not initialize_databases():
+        raise SystemExit("Could not initialize databases")
+    started = time.perf_counter()
+    try:
+        chroma, neo4j = get_chroma_manager(), get_neo4j_manager()
+        before = store_counts(chroma, neo4j)
+
+        with SnapshotWriter(args.archive) as writer:
+            collections = []
+            for name, metadata in chroma.list_collections():
+                # Left over from an interrupted compaction; the live collection is snapshotted instead
+                if is_compaction_collection(name):
+                    continue
+                entry, phase = snapshot_collection(writer, chroma, name, metadata, args.dtype, args.batch_size)
+                collections.append(entry)
+                report("snapshot", phase)
+            graph = snapshot_graph(writer, neo4j, args.graph_batch_size, "snapshot")
+
+            after = store_counts(chroma, neo4j)
+            if after != before:
+                raise SystemExit("The stores changed while the snapshot was taken; pause ingestion "
+                                 "(or snapshot a replica) and try again")
+            covered = sum(node["count"] for node in graph["nodes"])
+            if covered != before["graph"]["nodes"]:
+                logger.warning(f"{before['graph']['nodes'] - covered} nodes with other labels are not in the snapshot")
+
+            writer.close({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "embedding_model": settings.EMBEDDING_MODEL,
+                "embedding_dtype": args.dtype,
+                "collections": collections,
+                "graph": graph,
+                "counts": before
+            })
+    finally:
+        close_databases()
+
+    with SnapshotReader(args.archive) as reader:
+        size = reader.size
+    total = _phase("total", sum(c["count"] for c in collections)
+                   + sum(n["count"] for n in graph["nodes"]) + sum(r["count"] for r in graph["relationships"]),
+                   size, started)
+    report("snapshot", total)
+    print(f"[snapshot] wrote {args.archive}", file=sys.stderr)
+    return total
+
+
+def restore_collection(reader: SnapshotReader, chroma, entry: Dict[str, Any], batch_size: int) -> Dict[str, Any]:
+    """Recreate one collection from the archive"""
+    started = time.perf_counter()
+    name, count, sections = entry["name"], entry["count"], entry["sections"]
+    ids = reader.strings(sections["ids"])
+    documents = reader.strings(sections["documents"])
+    metadatas = reader.strings(sections["metadatas"])
+    embeddings = reader.array(sections["embeddings"])
+
+    chroma.recreate_collection(name, entry["metadata"])
+    batch_size = min(batch_size, chroma.client.max_batch_size)
+    for begin in range(0, count, batch_size):
+        end = min(begin + batch_size, count)
+        chroma.add_records(
+            name,
+            ids=ids.strings(begin, end),
+            embeddings=embeddings[begin:end].astype(np.float32).tolist(),
+            documents=documents.strings(begin, end),
+            metadatas=metadatas.json(begin, end)
+        )
+    return _phase(f"collection {name}", count, _section_bytes(sections), started)
+
+
+def restore_collections(reader: SnapshotReader, chroma, batch_size: int) -> List[Dict[str, Any]]:
+    """Restore every collection in the archive"""
+    phases = []
+    for entry in reader.manifest["collections"]:
+        phase = restore_collection(reader, chroma, entry, batch_size)
+        report("restore", phase)
+        phases.append(phase)
+    return phases
+
+
+def restore_graph(reader: SnapshotReader, neo4j, batch_size: int) -> List[Dict[str, Any]]:
+    """Recreate the graph: every node first, then the relationships between them"""
+    graph = reader.manifest["graph"]
+    phases = []
+    for node in graph["nodes"]:
+        started = time.perf_counter()
+        properties = reader.strings(node["sections"]["properties"])
+        for begin in range(0, node["count"], batch_size):
+            end = min(begin + batch_size, node["count"])
+            neo4j.create_nodes(node["label"], properties.json(begin, end, _decode_properties))
+        phases.append(_phase(f"nodes :{node['label']}", node["count"], _section_bytes(node["sections"]), started))
+        report("restore", phases[-1])
+
+    for rel in graph["relationships"]:
+        started = time.perf_counter()
+        starts = reader.strings(rel["sections"]["starts"])
+        ends = reader.strings(rel["sections"]["ends"])
+        properties = reader.strings(rel["sections"]["properties"])
+        for begin in range(0, rel["count"], batch_size):
+            end = min(begin + batch_size, rel["count"])
+            rows = [
+                {"start": start, "end": finish, "properties": props}
+                for start, finish, props in zip(starts.strings(begin, end), ends.strings(begin, end),
+                                                properties.json(begin, end, _decode_properties))
+            ]
+            neo4j.create_relationships(rel["type"], rel["start_label"], rel["start_key"],
+                                       rel["end_label"], rel["end_key"], rows)
+        phases.append(_phase(f"relationships [:{rel['type']}]", rel["count"], _section_bytes(rel["sections"]), started))
+        report("restore", phases[-1])
+    return phases
+
+
+def restore(args) -> Dict[str, Any]:
+    """Bulk-load a snapshot into the stores"""
+    try:
+        reader = SnapshotReader(args.archive)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    manifest = reader.manifest
+    started = time.perf_counter()
+
+    if manifest["embedding_model"] != settings.EMBEDDING_MODEL and not args.allow_model_mismatch:
+        raise SystemExit(f"Snapshot embeddings come from {manifest['embedding_model']} but EMBEDDING_MODEL is "
+                         f"{settings.EMBEDDING_MODEL}; queries would not match them (--allow-model-mismatch to restore anyway)")
+    if args.verify:
+        verify_started = time.perf_counter()
+        corrupt = reader.verify()
+        report("restore", _phase("verify", 0, reader.size, verify_started))
+        if corrupt:
+            raise SystemExit(f"Snapshot is corrupt, checksum mismatch in: {', '.join(corrupt)}")
+
+    if not initialize_databases():
+        raise SystemExit("Could not initialize databases")
+    try:
+        chroma, neo4j = get_chroma_manager(), get_neo4j_manager()
+        existing = store_counts(chroma, neo4j)
+        occupied = [c["name"] for c in manifest["collections"] if existing["collections"].get(c["name"])]
+        if occupied or existing["graph"]["nodes"]:
+            if not args.replace:
+                raise SystemExit(f"Target stores are not empty (collections: {occupied or 'none'}, "
+                                 f"graph nodes: {existing['graph']['nodes']}); use --replace to overwrite them")
+            clear_started = time.perf_counter()
+            deleted = neo4j.clear_graph(args.graph_batch_size)
+            report("restore", _phase("clear graph", deleted, 0, clear_started))
+
+        # The two stores are independent, so load them side by side
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            collections = executor.submit(restore_collections, reader, chroma, args.batch_size)
+            graph = executor.submit(restore_graph, reader, neo4j, args.graph_batch_size)
+            phases = collections.result() + graph.result()
+
+        if settings.HYBRID_SEARCH_ENABLED:
+            for tenant_id in document_tenants(manifest["collections"]):
+                lexical_started = time.perf_counter()
+                reset_lexical_index(tenant_id)
+                index = get_lexical_index(tenant_id)
+                report("restore", _phase(f"BM25 index {tenant_collection_name(tenant_id)}", index.count(), 0,
+                                         lexical_started))
+
+        restored = store_counts(chroma, neo4j)
+        mismatched = [c["name"] for c in manifest["collections"]
+                      if restored["collections"].get(c["name"]) != c["count"]]
+        mismatched += [f":{n['label']}" for n in manifest["graph"]["nodes"]
+                       if restored["graph"].get(f":{n['label']}", 0) != n["count"]]
+        mismatched += [f"[:{r['type']}]" for r in manifest["graph"]["relationships"]
+                       if restored["graph"].get(f"[:{r['type']}]", 0) != r["count"]]
+        if mismatched:
+            raise SystemExit(f"Restored counts do not match the snapshot for: {', '.join(mismatched)}")
+    finally:
+        close_databases()
+        reader.close()
+
+    total = _phase("total", sum(phase["records"] for phase in phases),
+                   sum(phase["bytes"] for phase in phases), started)
+    report("restore", total)
+    return total
+
+
+def info(args):
+    """Describe an archive, optionally checking its checksums"""
+    try:
+        reader = SnapshotReader(args.archive)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    with reader:
+        manifest = reader.manifest
+        print(f"{args.archive}: format {reader.version}, {reader.size / MB:.1f} MB, created {manifest['created_at']}")
+        print(f"embeddings: {manifest['embedding_model']} ({manifest['embedding_dtype']})")
+        for entry in manifest["collections"]:
+            shape = entry["sections"]["embeddings"]["shape"]
+            dimension = shape[1] if len(shape) > 1 else 0
+            print(f"  collection {entry['name']}: {entry['count']} records, dimension {dimension}")
+        for node in manifest["graph"]["nodes"]:
+            print(f"  nodes :{node['label']}: {node['count']}")
+        for rel in manifest["graph"]["relationships"]:
+            print(f"  relationships [:{rel['type']}]: {rel['count']}")
+        if args.verify:
+            started = time.perf_counter()
+            corrupt = reader.verify()
+            report("verify", _phase("checksums", 0, reader.size, started))
+            if corrupt:
+                raise SystemExit(f"Checksum mismatch in: {', '.join(corrupt)}")
+            print("all checksums match")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot and restore the ChromaDB collections and the Neo4j graph")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = commands.add_parser("create", help="Write a snapshot archive")
+    create_parser.add_argument("archive", help="Archive path")
+    create_parser.add_argument("--dtype", choices=["float16", "float32"], default="float16",
+                               help="Embedding precision in the archive (float32 restores vectors bit for bit)")
+    create_parser.add_argument("--batch-size", type=int, default=5000, help="Records read from ChromaDB per request")
+    create_parser.add_argument("--graph-batch-size", type=int, default=10000, help="Nodes/relationships per batch")
+
+    restore_parser = commands.add_parser("restore", help="Bulk-load a snapshot archive into empty stores")
+    restore_parser.add_argument("archive", help="Archive path")
+    restore_parser.add_argument("--replace", action="store_true",
+                                help="Drop the snapshot's collections and the whole graph before loading")
+    restore_parser.add_argument("--no-verify", dest="verify", action="store_false", help="Skip the checksum pass")
+    restore_parser.add_argument("--allow-model-mismatch", action="store_true",
+                                help="Restore even if EMBEDDING_MODEL differs from the snapshot's")
+    restore_parser.add_argument("--batch-size", type=int, default=5000, help="Records written to ChromaDB per request")
+    restore_parser.add_argument("--graph-batch-size", type=int, default=10000, help="Nodes/relationships per transaction")
+
+    info_parser = commands.add_parser("info", help="Describe a snapshot archive")
+    info_parser.add_argument("archive", help="Archive path")
+    info_parser.add_argument("--verify", action="store_true", help="Check every section's checksum")
+    args = parser.parse_args()
+
+    # Per-batch INFO logs would drown the throughput report
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.command == "create":
+        create(args)
+    elif args.command == "restore":
+        restore(args)
+    else:
+        info(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,18 +20,63 @@ class Settings:
     # ChromaDB Settings
     CHROMA_PERSIST_DIRECTORY: str = os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/chroma")
     CHROMA_COLLECTION_NAME: str = os.getenv("CHROMA_COLLECTION_NAME", "documents")
+    CHROMA_COMPACTION_RATIO: float = float(os.getenv("CHROMA_COMPACTION_RATIO", "0.2"))  # deleted / total
+    CHROMA_COMPACTION_MIN_DELETES: int = int(os.getenv("CHROMA_COMPACTION_MIN_DELETES", "100"))
     
     # Neo4j Settings
     NEO4J_URI: str = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USER: str = os.getenv("NEO4J_USER", "neo4j")
     NEO4J_PASSWORD: str = os.getenv("NEO4J_PASSWORD", "password")
     NEO4J_DATABASE: str = os.getenv("NEO4J_DATABASE", "neo4j")
+    NEO4J_CONNECTION_TIMEOUT: float = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "5"))  # seconds
+    
+    # Store Connection Settings (startup backoff and background reconnect)
+    STORE_CONNECT_INITIAL_DELAY: float = float(os.getenv("STORE_CONNECT_INITIAL_DELAY", "0.5"))  # seconds
+    STORE_CONNECT_MAX_DELAY: float = float(os.getenv("STORE_CONNECT_MAX_DELAY", "30"))
+    STORE_HEALTH_INTERVAL: float = float(os.getenv("STORE_HEALTH_INTERVAL", "15"))
     
     # Embedding Settings
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" or "onnx" (int8-quantized)
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = runtime default
+    EMBEDDING_MAX_SEQ_LENGTH: int = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "256"))
+    ONNX_MODEL_DIRECTORY: str = os.getenv("ONNX_MODEL_DIRECTORY", "./data/onnx")
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite3")
+    SPACY_BATCH_SIZE: int = int(os.getenv("SPACY_BATCH_SIZE", "64"))
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))
     
+    # Hybrid Retrieval Settings
+    HYBRID_SEARCH_ENABLED: bool = os.getenv("HYBRID_SEARCH_ENABLED", "True").lower() == "true"
+    BM25_INDEX_DIRECTORY: str = os.getenv("BM25_INDEX_DIRECTORY", "./data/bm25")
+    BM25_K1: float = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+    BM25_FLUSH_DOCS: int = int(os.getenv("BM25_FLUSH_DOCS", "256"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    
+    # Batch Query Settings
+    BATCH_QUERY_MAX_SIZE: int = int(os.getenv("BATCH_QUERY_MAX_SIZE", "1000"))
+    BATCH_QUERY_LLM_CONCURRENCY: int = int(os.getenv("BATCH_QUERY_LLM_CONCURRENCY", "8"))
+    
+    # Community Summary Settings
+    COMMUNITY_MIN_SIZE: int = int(os.getenv("COMMUNITY_MIN_SIZE", "3"))  # smaller communities get no summary
+    COMMUNITY_MAX_ITERATIONS: int = int(os.getenv("COMMUNITY_MAX_ITERATIONS", "20"))
+    COMMUNITY_SUMMARY_TOP_ENTITIES: int = int(os.getenv("COMMUNITY_SUMMARY_TOP_ENTITIES", "10"))
+    COMMUNITY_SUMMARY_TOP_DOCUMENTS: int = int(os.getenv("COMMUNITY_SUMMARY_TOP_DOCUMENTS", "3"))
+    COMMUNITY_SNIPPET_CHARS: int = int(os.getenv("COMMUNITY_SNIPPET_CHARS", "200"))
+    COMMUNITY_SUMMARY_MAX_CHARS: int = int(os.getenv("COMMUNITY_SUMMARY_MAX_CHARS", "1500"))
+    COMMUNITY_GLOBAL_TOP_K: int = int(os.getenv("COMMUNITY_GLOBAL_TOP_K", "5"))  # summaries per global query
+    
+    # Admission Control Settings (per lane: concurrent requests and queue length)
+    ADMISSION_INTERACTIVE_CONCURRENCY: int = int(os.getenv("ADMISSION_INTERACTIVE_CONCURRENCY", "8"))
+    ADMISSION_INTERACTIVE_QUEUE: int = int(os.getenv("ADMISSION_INTERACTIVE_QUEUE", "32"))
+    ADMISSION_BATCH_CONCURRENCY: int = int(os.getenv("ADMISSION_BATCH_CONCURRENCY", "2"))
+    ADMISSION_BATCH_QUEUE: int = int(os.getenv("ADMISSION_BATCH_QUEUE", "8"))
+    ADMISSION_INGEST_CONCURRENCY: int = int(os.getenv("ADMISSION_INGEST_CONCURRENCY", "2"))
+    ADMISSION_INGEST_QUEUE: int = int(os.getenv("ADMISSION_INGEST_QUEUE", "16"))
+    ADMISSION_DEFAULT_TIMEOUT: float = float(os.getenv("ADMISSION_DEFAULT_TIMEOUT", "30"))  # seconds, 0 = no deadline
+    
     # Processing Settings
     MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", "4000"))
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.7"))
@@ -2,19 +2,146 @@ import chromadb
 from chromadb.config import Settings as ChromaSettings
 from neo4j import GraphDatabase
 from typing import Optional, Dict, Any
+import os
+import re
+import json
+import hashlib
 import logging
+import threading
+from contextlib import contextmanager
 from .config import settings
+from .lexical_index import BM25Index, remove_index_files
+from .embedding_cache import EmbeddingCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def build_where_clause(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Translate metadata filters into a ChromaDB where clause
+    
+    Plain values become equality matches, lists become ``$in`` matches and
+    dicts (e.g. ``{"$gte": 2023}``) or top-level ``$and``/``$or`` clauses are
+    passed through unchanged. Multiple fields are combined with ``$and``.
+    """
+    if not filters:
+        return None
+    
+    clauses = []
+    for key, value in filters.items():
+        if key.startswith("$") or isinstance(value, dict):
+            clauses.append({key: value})
+        elif isinstance(value, list):
+            clauses.append({key: {"$in": value}})
+        else:
+            clauses.append({key: {"$eq": value}})
+    
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+# Suffixes of collections derived from a tenant's collection (see derived_collection_name)
+COMPACTION_SUFFIXES = ("compact", "retired")
+
+# Tenant IDs that would read as a derived name's suffix or as a hashed name
+_RESERVED_TENANT_PATTERN = re.compile(r"(compact|retired|communities|t[0-9a-f]{16})")
+
+def tenant_collection_name(tenant_id: Optional[str]) -> str:
+    """Name of the ChromaDB collection holding a tenant's documents
+    
+    Tenant IDs are used as-is when they are plain and short. Other IDs are
+    hashed: those that could run into the "__" separator of derived names,
+    reserved words and IDs that look like a hash.
+    """
+    if not tenant_id:
+        return settings.CHROMA_COLLECTION_NAME
+    
+    # Chroma names are 3-63 chars of [a-zA-Z0-9._-]
+    safe_tenant = re.sub(r"[^a-zA-Z0-9_-]", "_", tenant_id)
+    name = f"{settings.CHROMA_COLLECTION_NAME}__{safe_tenant}"
+    if (len(name) > 63 or safe_tenant != tenant_id or "__" in tenant_id or tenant_id.strip("_") != tenant_id
+            or _RESERVED_TENANT_PATTERN.fullmatch(tenant_id)):
+        digest = hashlib.sha1(tenant_id.encode("utf-8")).hexdigest()[:16]
+        name = f"{settings.CHROMA_COLLECTION_NAME[:40]}__t{digest}"
+    return name
+
+def derived_collection_name(name: str, suffix: str) -> str:
+    """Name of a collection derived from another, e.g. its compaction copy
+    
+    Tenant collection names never contain a second "__", so these cannot
+    collide with another tenant's collection.
+    """
+    derived = f"{name}__{suffix}"
+    if len(derived) > 63:
+        derived = f"{suffix}__{hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]}"
+    return derived
+
+def is_compaction_collection(name: str) -> bool:
+    """Whether a collection is a compaction copy or a retired original rather than live data"""
+    return any(name.endswith(f"__{suffix}") or name.startswith(f"{suffix}__") for suffix in COMPACTION_SUFFIXES)
+
+def community_collection_name(tenant_id: Optional[str]) -> str:
+    """Name of the ChromaDB collection holding a tenant's community summaries"""
+    return derived_collection_name(tenant_collection_name(tenant_id), "communities")
+
+class _CollectionLock:
+    """Shared/exclusive lock guarding one ChromaDB collection
+    
+    Reads and writes hold it shared; compaction holds it exclusively while it
+    copies and swaps the collection. A waiting compaction blocks new shared
+    holders so it is not starved.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._exclusive_waiting = 0
+    
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            while self._exclusive or self._exclusive_waiting:
+                self._condition.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                if not self._shared:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._exclusive_waiting += 1
+            while self._exclusive or self._shared:
+                self._condition.wait()
+            self._exclusive_waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
 class ChromaDBManager:
-    """Manager for ChromaDB operations"""
+    """Manager for ChromaDB operations
+    
+    Each tenant gets its own collection so queries only search that tenant's
+    HNSW index; documents without a tenant live in the default collection.
+    """
     
     def __init__(self):
         self.client: Optional[chromadb.Client] = None
         self.collection: Optional[chromadb.Collection] = None
+        self._tenant_collections: Dict[str, chromadb.Collection] = {}
+        self._community_collections: Dict[str, chromadb.Collection] = {}
+        self._deleted_since_compaction: Dict[str, int] = {}
+        self._compaction_state_lock = threading.Lock()
+        # Collections being compacted -> ids whose metadata changed during the copy
+        self._compaction_updates: Dict[str, set] = {}
+        self._collection_locks: Dict[str, _CollectionLock] = {}
         self._initialize()
     
     def _initialize(self):
@@ -29,54 +156,399 @@ class ChromaDBManager:
             )
             
             # Get or create collection
+            self._recover_compaction(settings.CHROMA_COLLECTION_NAME)
             self.collection = self.client.get_or_create_collection(
                 name=settings.CHROMA_COLLECTION_NAME,
                 metadata={"hnsw:space": "cosine"}
             )
             
+            self._deleted_since_compaction = self._load_compaction_state()
+            
             logger.info(f"ChromaDB initialized successfully. Collection: {settings.CHROMA_COLLECTION_NAME}")
             
         except Exception as e:
             logger.error(f"Failed to initialize ChromaDB: {e}")
             raise
     
-    def add_documents(self, documents: list, metadatas: list, ids: list):
-        """Add documents to ChromaDB"""
-        try:
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
+    def get_collection(self, tenant_id: Optional[str] = None):
+        """Get (or create) the collection for a tenant"""
+        if not tenant_id:
+            return self.collection
+        
+        collection = self._tenant_collections.get(tenant_id)
+        if collection is None:
+            self._recover_compaction(tenant_collection_name(tenant_id))
+            collection = self.client.get_or_create_collection(
+                name=tenant_collection_name(tenant_id),
+                metadata={"hnsw:space": "cosine", "tenant_id": tenant_id}
             )
+            self._tenant_collections[tenant_id] = collection
+        return collection
+    
+    def _lock(self, tenant_id: Optional[str] = None) -> _CollectionLock:
+        """Lock guarding a tenant's collection against compaction"""
+        return self._collection_locks.setdefault(tenant_collection_name(tenant_id), _CollectionLock())
+    
+    def add_documents(self, documents: list, metadatas: list, ids: list, tenant_id: Optional[str] = None,
+                      embeddings: Optional[list] = None):
+        """Add documents to ChromaDB (embedded by Chroma unless embeddings are given)"""
+        try:
+            with self._lock(tenant_id).shared():
+                self.get_collection(tenant_id).add(
+                    documents=documents,
+                    embeddings=embeddings,
+                    metadatas=metadatas,
+                    ids=ids
+                )
             logger.info(f"Added {len(documents)} documents to ChromaDB")
         except Exception as e:
             logger.error(f"Failed to add documents to ChromaDB: {e}")
             raise
     
-    def query(self, query_texts: list, n_results: int = 5):
-        """Query ChromaDB for similar documents"""
+    def query(self, query_texts: Optional[list] = None, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+              tenant_id: Optional[str] = None, query_embeddings: Optional[list] = None):
+        """Query ChromaDB for similar documents, pre-filtered by metadata"""
         try:
-            results = self.collection.query(
-                query_texts=query_texts,
-                n_results=n_results
-            )
+            with self._lock(tenant_id).shared():
+                results = self.get_collection(tenant_id).query(
+                    query_texts=query_texts,
+                    query_embeddings=query_embeddings,
+                    n_results=n_results,
+                    where=where
+                )
             return results
         except Exception as e:
             logger.error(f"Failed to query ChromaDB: {e}")
             raise
     
-    def get_collection_info(self):
+    def update_metadatas(self, ids: list, metadatas: list, tenant_id: Optional[str] = None):
+        """Replace the metadata of existing documents without re-embedding them"""
+        try:
+            with self._lock(tenant_id).shared():
+                self.get_collection(tenant_id).update(
+                    ids=ids,
+                    metadatas=metadatas
+                )
+                with self._compaction_state_lock:
+                    updated = self._compaction_updates.get(tenant_collection_name(tenant_id))
+                    if updated is not None:
+                        updated.update(ids)
+            logger.info(f"Updated metadata for {len(ids)} documents in ChromaDB")
+        except Exception as e:
+            logger.error(f"Failed to update documents in ChromaDB: {e}")
+            raise
+    
+    def delete_documents(self, ids: list, tenant_id: Optional[str] = None):
+        """Delete documents and their vectors from ChromaDB"""
+        try:
+            name = tenant_collection_name(tenant_id)
+            with self._lock(tenant_id).shared():
+                self.get_collection(tenant_id).delete(ids=ids)
+                self._record_deletes(name, len(ids))
+            logger.info(f"Deleted {len(ids)} documents from ChromaDB")
+        except Exception as e:
+            logger.error(f"Failed to delete documents from ChromaDB: {e}")
+            raise
+    
+    def _compaction_state_path(self) -> str:
+        return os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "compaction_state.json")
+    
+    def _load_compaction_state(self) -> Dict[str, int]:
+        """Deletes per collection since its last compaction, as persisted by _record_deletes"""
+        try:
+            with open(self._compaction_state_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable compaction state: {e}")
+            return {}
+    
+    def _record_deletes(self, name: str, count: int, reset: bool = False):
+        """Add to (or reset to) a collection's delete count and persist it
+        
+        The count has to survive restarts, otherwise a collection whose
+        deletes were spread over several runs would never be compacted.
+        """
+        with self._compaction_state_lock:
+            previous = 0 if reset else self._deleted_since_compaction.get(name, 0)
+            self._deleted_since_compaction[name] = previous + count
+            path = self._compaction_state_path()
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._deleted_since_compaction, f)
+            os.replace(tmp_path, path)
+    
+    def needs_compaction(self, tenant_id: Optional[str] = None) -> bool:
+        """Whether enough documents were deleted to make rebuilding the HNSW index worthwhile"""
+        deleted = self._deleted_since_compaction.get(tenant_collection_name(tenant_id), 0)
+        if deleted == 0:
+            return False
+        live = self.get_collection(tenant_id).count()
+        return deleted >= settings.CHROMA_COMPACTION_MIN_DELETES and deleted >= settings.CHROMA_COMPACTION_RATIO * (live + deleted)
+    
+    def compact_collection(self, tenant_id: Optional[str] = None, batch_size: int = 1000):
+        """Rebuild a collection from its live records
+        
+        Deletes in hnswlib only mark elements as deleted, so the index keeps
+        their memory and graph links. Copying the live records into a fresh
+        collection and swapping it in drops them.
+        
+        The copy runs alongside reads and writes: the lock is held exclusively
+        only while each batch is read (Chroma's get with embeddings races with
+        concurrent deletes), not while the batch is written to the copy, which
+        is the slow part. The final step holds it to bring the copy up to date
+        (adds, deletes and metadata updates made during the copy) by comparing
+        ids, then swaps. The old collection is renamed aside before the copy takes
+        its name, so a crash part-way leaves one of them for
+        _recover_compaction to keep.
+        """
+        name = tenant_collection_name(tenant_id)
+        with self._compaction_state_lock:
+            if name in self._compaction_updates:
+                return
+            self._compaction_updates[name] = set()
+        try:
+            if not self.needs_compaction(tenant_id):
+                return
+            
+            compact_name = derived_collection_name(name, "compact")
+            retired_name = derived_collection_name(name, "retired")
+            old = self.get_collection(tenant_id)
+            # Never reuse a partial copy left by a failed run
+            self._delete_collection_if_exists(compact_name)
+            new = self.client.create_collection(name=compact_name, metadata=old.metadata)
+            
+            # Deletes during the copy shift offsets, so records can be skipped or seen twice;
+            # upsert absorbs repeats and the id comparison below picks up the skipped ones
+            offset = 0
+            while True:
+                with self._lock(tenant_id).exclusive():
+                    batch = old.get(
+                        include=["embeddings", "documents", "metadatas"],
+                        limit=batch_size,
+                        offset=offset
+                    )
+                if not batch["ids"]:
+                    break
+                new.upsert(
+                    ids=batch["ids"],
+                    embeddings=batch["embeddings"],
+                    documents=batch["documents"],
+                    metadatas=batch["metadatas"]
+                )
+                offset += len(batch["ids"])
+            
+            with self._lock(tenant_id).exclusive():
+                live_ids = set(old.get(include=[])["ids"])
+                copied_ids = set(new.get(include=[])["ids"])
+                stale_ids = list(copied_ids - live_ids)
+                with self._compaction_state_lock:
+                    updated = self._compaction_updates[name]
+                missing_ids = list((live_ids - copied_ids) | (updated & live_ids))
+                if stale_ids:
+                    new.delete(ids=stale_ids)
+                for start in range(0, len(missing_ids), batch_size):
+                    batch = old.get(ids=missing_ids[start:start + batch_size],
+                                    include=["embeddings", "documents", "metadatas"])
+                    new.upsert(
+                        ids=batch["ids"],
+                        embeddings=batch["embeddings"],
+                        documents=batch["documents"],
+                        metadatas=batch["metadatas"]
+                    )
+                
+                self._delete_collection_if_exists(retired_name)
+                old.modify(name=retired_name)
+                new.modify(name=name)
+                self.client.delete_collection(retired_name)
+                if tenant_id:
+                    self._tenant_collections[tenant_id] = new
+                else:
+                    self.collection = new
+                # Deletes replayed onto the copy are tombstones in its index too
+                self._record_deletes(name, len(stale_ids), reset=True)
+            logger.info(f"Compacted ChromaDB collection {name}: {len(live_ids)} live documents "
+                        f"({len(missing_ids)} caught up, {len(stale_ids)} removed after the copy)")
+            
+        except Exception as e:
+            logger.error(f"Failed to compact ChromaDB collection: {e}")
+            raise
+        finally:
+            with self._compaction_state_lock:
+                self._compaction_updates.pop(name, None)
+    
+    def _delete_collection_if_exists(self, name: str):
+        try:
+            self.client.delete_collection(name)
+        except ValueError:
+            pass
+    
+    def _recover_compaction(self, name: str):
+        """Finish a compaction that crashed between renaming the old collection aside and deleting it"""
+        existing = {collection.name for collection in self.client.list_collections()}
+        retired_name = derived_collection_name(name, "retired")
+        if retired_name not in existing:
+            return
+        if name in existing:
+            self.client.delete_collection(retired_name)
+        else:
+            # The copy may be incomplete, so fall back to the pre-compaction collection
+            self.client.get_collection(retired_name).modify(name=name)
+        logger.warning(f"Recovered ChromaDB collection {name} from an interrupted compaction")
+    
+    def get_documents(self, ids: list, where: Optional[Dict[str, Any]] = None, tenant_id: Optional[str] = None):
+        """Fetch documents and metadata by ID, optionally restricted by metadata"""
+        try:
+            with self._lock(tenant_id).shared():
+                return self.get_collection(tenant_id).get(
+                    ids=ids,
+                    where=where,
+                    include=["documents", "metadatas"]
+                )
+        except Exception as e:
+            logger.error(f"Failed to get documents from ChromaDB: {e}")
+            raise
+    
+    def iter_documents(self, batch_size: int = 1000, tenant_id: Optional[str] = None):
+        """Yield (ids, documents) batches over a whole collection"""
+        collection = self.get_collection(tenant_id)
+        offset = 0
+        while True:
+            batch = collection.get(
+                include=["documents"],
+                limit=batch_size,
+                offset=offset
+            )
+            if not batch["ids"]:
+                break
+            yield batch["ids"], batch["documents"]
+            offset += len(batch["ids"])
+
+    def list_collections(self) -> list:
+        """(name, metadata) of every collection: tenants' documents and community summaries"""
+        return [(collection.name, collection.metadata) for collection in self.client.list_collections()]
+
+    def count_records(self, name: str) -> int:
+        """Number of records in a collection, by collection name"""
+        return self.client.get_collection(name).count()
+
+    def iter_records(self, name: str, batch_size: int = 1000):
+        """Yield batches of a collection's ids, embeddings, documents and metadatas"""
+        collection = self.client.get_collection(name)
+        offset = 0
+        while True:
+            batch = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            if not batch["ids"]:
+                break
+            yield batch
+            offset += len(batch["ids"])
+
+    def recreate_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None):
+        """Drop a collection if it exists and create it again, empty"""
+        try:
+            self.client.delete_collection(name)
+        except ValueError:
+            pass
+        collection = self.client.create_collection(name=name, metadata=metadata)
+
+        # Cached handles would point at the dropped collection
+        self._tenant_collections = {k: v for k, v in self._tenant_collections.items() if v.name != name}
+        self._community_collections = {k: v for k, v in self._community_collections.items() if v.name != name}
+        self._record_deletes(name, 0, reset=True)
+        if name == settings.CHROMA_COLLECTION_NAME:
+            self.collection = collection
+        return collection
+
+    def add_records(self, name: str, ids: list, embeddings: list, documents: Optional[list] = None,
+                    metadatas: Optional[list] = None):
+        """Add pre-embedded records to a collection, by collection name"""
+        try:
+            self.client.get_collection(name).add(
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas
+            )
+        except Exception as e:
+            logger.error(f"Failed to add records to ChromaDB collection {name}: {e}")
+            raise
+
+    def get_community_collection(self, tenant_id: Optional[str] = None):
+        """Get (or create) the collection of a tenant's community summaries"""
+        key = tenant_id or ""
+        collection = self._community_collections.get(key)
+        if collection is None:
+            collection = self.client.get_or_create_collection(
+                name=community_collection_name(tenant_id),
+                metadata={"hnsw:space": "cosine"}
+            )
+            self._community_collections[key] = collection
+        return collection
+    
+    def upsert_communities(self, ids: list, summaries: list, embeddings: list, metadatas: list,
+                           tenant_id: Optional[str] = None):
+        """Insert or replace community summaries"""
+        try:
+            self.get_community_collection(tenant_id).upsert(
+                ids=ids,
+                documents=summaries,
+                embeddings=embeddings,
+                metadatas=metadatas
+            )
+            logger.info(f"Indexed {len(ids)} community summaries in ChromaDB")
+        except Exception as e:
+            logger.error(f"Failed to index community summaries in ChromaDB: {e}")
+            raise
+    
+    def delete_communities(self, ids: list, tenant_id: Optional[str] = None):
+        """Remove community summaries"""
+        try:
+            self.get_community_collection(tenant_id).delete(ids=ids)
+        except Exception as e:
+            logger.error(f"Failed to delete community summaries from ChromaDB: {e}")
+            raise
+    
+    def query_communities(self, query_embeddings: list, n_results: int = 5, tenant_id: Optional[str] = None):
+        """Find the community summaries closest to the query embeddings"""
+        try:
+            collection = self.get_community_collection(tenant_id)
+            count = collection.count()
+            if count == 0:
+                return {"ids": [[] for _ in query_embeddings], "documents": [[] for _ in query_embeddings],
+                        "metadatas": None, "distances": None}
+            return collection.query(
+                query_embeddings=query_embeddings,
+                n_results=min(n_results, count)
+            )
+        except Exception as e:
+            logger.error(f"Failed to query community summaries: {e}")
+            raise
+    
+    def count_communities(self, tenant_id: Optional[str] = None) -> int:
+        """Number of indexed community summaries"""
+        return self.get_community_collection(tenant_id).count()
+    
+    def get_collection_info(self, tenant_id: Optional[str] = None):
         """Get information about the collection"""
         try:
-            count = self.collection.count()
+            count = self.get_collection(tenant_id).count()
             return {
-                "name": settings.CHROMA_COLLECTION_NAME,
+                "name": tenant_collection_name(tenant_id),
                 "document_count": count,
                 "status": "connected"
             }
         except Exception as e:
             logger.error(f"Failed to get collection info: {e}")
             return {"status": "error", "error": str(e)}
+    
+    def ping(self):
+        """Raise if ChromaDB is not reachable"""
+        self.client.heartbeat()
 
 class Neo4jManager:
     """Manager for Neo4j operations"""
@@ -88,9 +560,11 @@ class Neo4jManager:
     def _initialize(self):
         """Initialize Neo4j driver"""
         try:
+            # Fail fast while Neo4j is down so startup backoff, not the driver, decides the retry pace
             self.driver = GraphDatabase.driver(
                 settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                connection_timeout=settings.NEO4J_CONNECTION_TIMEOUT
             )
             
             # Test connection
@@ -98,10 +572,21 @@ class Neo4jManager:
                 result = session.run("RETURN 1 as test")
                 result.single()
             
+            # Entity lookups are always scoped to a tenant, so index (tenant_id, name)
+            with self.driver.session() as session:
+                session.run("CREATE INDEX entity_tenant_name IF NOT EXISTS FOR (e:Entity) ON (e.tenant_id, e.name)")
+                session.run("CREATE INDEX entity_name IF NOT EXISTS FOR (e:Entity) ON (e.name)")
+                session.run("CREATE INDEX entity_id IF NOT EXISTS FOR (e:Entity) ON (e.id)")
+                session.run("CREATE INDEX document_key IF NOT EXISTS FOR (d:Document) ON (d.key)")
+                session.run("CREATE INDEX entity_community IF NOT EXISTS FOR (e:Entity) ON (e.community_id)")
+                session.run("CREATE INDEX community_id IF NOT EXISTS FOR (c:Community) ON (c.id)")
+            
             logger.info("Neo4j initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize Neo4j: {e}")
+            if self.driver:
+                self.driver.close()
             raise
     
     def create_entity(self, entity_id: str, name: str, entity_type: str, properties: Dict[str, Any] = None):
@@ -123,7 +608,11 @@ class Neo4jManager:
             raise
     
     def create_relationship(self, source_id: str, target_id: str, relationship_type: str, properties: Dict[str, Any] = None):
-        """Create a relationship between entities"""
+        """Create a relationship between entities
+        
+        Relationships are not tied to documents: they go when either entity
+        is garbage-collected by remove_document.
+        """
         try:
             with self.driver.session() as session:
                 query = """
@@ -141,22 +630,353 @@ class Neo4jManager:
             logger.error(f"Failed to create relationship: {e}")
             raise
     
-    def query_entities(self, entity_names: list):
-        """Query for entities and their relationships"""
+    def add_document_mentions(self, documents: list, tenant_id: Optional[str] = None):
+        """Record entity mentions for a batch of documents in one transaction
+        
+        Each document is a dict with a key and a list of entities (dicts with
+        id, name, type and count). Entities are merged and a
+        (:Document)-[:MENTIONS {count}]->(:Entity) edge remembers the
+        contribution so it can be subtracted when the document is deleted.
+        mention_count is only incremented when that edge is created, so
+        re-running a batch is a no-op. Touched entities are flagged
+        community_dirty so the next community refresh only recomputes their
+        communities.
+        """
         try:
             with self.driver.session() as session:
                 query = """
+                UNWIND $documents AS doc
+                MERGE (d:Document {key: doc.key})
+                SET d.tenant_id = $tenant_id
+                WITH d, doc
+                UNWIND doc.entities AS ent
+                MERGE (e:Entity {id: ent.id})
+                ON CREATE SET e.name = ent.name, e.type = ent.type, e.tenant_id = $tenant_id
+                SET e.community_dirty = true
+                MERGE (d)-[m:MENTIONS]->(e)
+                ON CREATE SET m.count = ent.count, e.mention_count = coalesce(e.mention_count, 0) + ent.count
+                """
+                session.execute_write(lambda tx: tx.run(query, documents=documents, tenant_id=tenant_id).consume())
+                logger.info(f"Recorded entity mentions for {len(documents)} documents")
+        except Exception as e:
+            logger.error(f"Failed to record document mentions: {e}")
+            raise
+    
+    def remove_document(self, document_key: str) -> Dict[str, int]:
+        """Release a document's entity mentions and garbage-collect orphans
+        
+        Runs as a single write transaction: mention counts are decremented,
+        the Document node is removed and entities that reach zero are deleted
+        together with their relationships.
+        """
+        def _remove(tx):
+            entity_ids = tx.run("""
+                MATCH (d:Document {key: $document_key})-[m:MENTIONS]->(e:Entity)
+                SET e.mention_count = coalesce(e.mention_count, m.count) - m.count, e.community_dirty = true
+                RETURN collect(e.id) AS entity_ids
+            """, document_key=document_key).single()["entity_ids"]
+            
+            tx.run("MATCH (d:Document {key: $document_key}) DETACH DELETE d", document_key=document_key).consume()
+            
+            deleted = tx.run("""
                 MATCH (e:Entity)
-                WHERE e.name IN $entity_names
+                WHERE e.id IN $entity_ids AND e.mention_count <= 0
+                OPTIONAL MATCH (e)-[r:RELATES_TO]-()
+                WITH collect(DISTINCT e) AS entities, count(DISTINCT r) AS relationships
+                FOREACH (e IN entities | DETACH DELETE e)
+                RETURN size(entities) AS entities, relationships
+            """, entity_ids=entity_ids).single()
+            
+            return {"deleted_entities": deleted["entities"], "deleted_relationships": deleted["relationships"]}
+        
+        try:
+            with self.driver.session() as session:
+                result = session.execute_write(_remove)
+                logger.info(f"Removed {document_key} from graph: {result}")
+                return result
+        except Exception as e:
+            logger.error(f"Failed to remove document from graph: {e}")
+            raise
+    
+    def query_entities(self, entity_names: list, tenant_id: Optional[str] = None):
+        """Query for entities and their relationships within a tenant's partition
+        
+        Rows are dicts with the entity's properties (e), the relationship's
+        properties (r, None when the entity has no relationships) and the
+        related entity's properties (related).
+        """
+        try:
+            # Entities without a tenant_id belong to the default partition
+            tenant_predicate = "e.tenant_id = $tenant_id" if tenant_id else "e.tenant_id IS NULL"
+            related_predicate = tenant_predicate.replace("e.", "related.")
+            with self.driver.session() as session:
+                query = f"""
+                MATCH (e:Entity)
+                WHERE e.name IN $entity_names AND {tenant_predicate}
                 OPTIONAL MATCH (e)-[r:RELATES_TO]->(related:Entity)
-                RETURN e, r, related
+                WHERE {related_predicate}
+                RETURN e, properties(r) AS r, related
                 """
-                result = session.run(query, entity_names=entity_names)
+                result = session.run(query, entity_names=entity_names, tenant_id=tenant_id)
                 return [record.data() for record in result]
         except Exception as e:
             logger.error(f"Failed to query entities: {e}")
             raise
     
+    def get_community_scope(self, tenant_id: Optional[str] = None, full: bool = False) -> list:
+        """Entities whose community must be recomputed, as dicts with id and community_id
+        
+        Incrementally that is every entity flagged community_dirty (or never
+        assigned), plus all members of the communities those entities are in;
+        with full=True it is every entity of the tenant.
+        """
+        tenant_predicate = "e.tenant_id = $tenant_id" if tenant_id else "e.tenant_id IS NULL"
+        try:
+            with self.driver.session() as session:
+                if full:
+                    query = f"""
+                    MATCH (e:Entity) WHERE {tenant_predicate}
+                    RETURN e.id AS id, e.community_id AS community_id
+                    """
+                else:
+                    query = f"""
+                    MATCH (e:Entity)
+                    WHERE {tenant_predicate} AND (e.community_dirty = true OR e.community_id IS NULL)
+                    WITH collect(e) AS dirty, collect(DISTINCT e.community_id) AS touched
+                    OPTIONAL MATCH (m:Entity) WHERE m.community_id IN touched
+                    WITH dirty + collect(m) AS scope
+                    UNWIND scope AS e
+                    RETURN DISTINCT e.id AS id, e.community_id AS community_id
+                    """
+                result = session.run(query, tenant_id=tenant_id)
+                return [record.data() for record in result]
+        except Exception as e:
+            logger.error(f"Failed to get community refresh scope: {e}")
+            raise
+    
+    def get_entity_neighbours(self, entity_ids: list) -> list:
+        """Weighted neighbours of entities for community detection
+        
+        Two entities are linked by RELATES_TO edges (weight 1 each) and by
+        co-mentions in the same document, each document
+        contributing 1 / (entities in the document - 1) so long documents
+        don't glue everything together. Returns dicts with source, target,
+        target_community and weight; edges are reported from both ends.
+        """
+        try:
+            with self.driver.session() as session:
+                co_mentions = session.run("""
+                UNWIND $entity_ids AS entity_id
+                MATCH (a:Entity {id: entity_id})<-[:MENTIONS]-(d:Document)-[:MENTIONS]->(b:Entity)
+                WHERE b.id <> a.id
+                WITH a, b, d, COUNT { (d)-[:MENTIONS]->() } AS size
+                RETURN a.id AS source, b.id AS target, b.community_id AS target_community,
+                       sum(1.0 / (size - 1)) AS weight
+                """, entity_ids=entity_ids)
+                rows = [record.data() for record in co_mentions]
+                
+                relations = session.run("""
+                UNWIND $entity_ids AS entity_id
+                MATCH (a:Entity {id: entity_id})-[r:RELATES_TO]-(b:Entity)
+                WHERE b.id <> a.id
+                RETURN a.id AS source, b.id AS target, b.community_id AS target_community,
+                       toFloat(count(r)) AS weight
+                """, entity_ids=entity_ids)
+                rows.extend(record.data() for record in relations)
+                return rows
+        except Exception as e:
+            logger.error(f"Failed to get entity neighbours: {e}")
+            raise
+    
+    def assign_communities(self, assignments: list):
+        """Set community_id on entities (dicts with id and community_id) and clear their dirty flag"""
+        try:
+            with self.driver.session() as session:
+                query = """
+                UNWIND $assignments AS assignment
+                MATCH (e:Entity {id: assignment.id})
+                SET e.community_id = assignment.community_id
+                REMOVE e.community_dirty
+                """
+                session.execute_write(lambda tx: tx.run(query, assignments=assignments).consume())
+        except Exception as e:
+            logger.error(f"Failed to assign communities: {e}")
+            raise
+    
+    def get_community_profiles(self, community_ids: list, top_entities: int = 10, top_documents: int = 3) -> Dict[str, Dict[str, Any]]:
+        """Size, most-mentioned entities, strongest pairs and most representative documents per community"""
+        try:
+            with self.driver.session() as session:
+                profiles: Dict[str, Dict[str, Any]] = {}
+                for record in session.run("""
+                UNWIND $community_ids AS community_id
+                MATCH (e:Entity {community_id: community_id})
+                WITH community_id, e ORDER BY coalesce(e.mention_count, 0) DESC
+                WITH community_id, count(e) AS size, collect(e)[..$top_entities] AS top
+                RETURN community_id, size,
+                       [e IN top | {name: e.name, type: e.type, mentions: coalesce(e.mention_count, 0)}] AS entities
+                """, community_ids=community_ids, top_entities=top_entities):
+                    profiles[record["community_id"]] = {
+                        "size": record["size"],
+                        "entities": record["entities"],
+                        "pairs": [],
+                        "documents": []
+                    }
+                
+                for record in session.run("""
+                UNWIND $community_ids AS community_id
+                MATCH (a:Entity {community_id: community_id})<-[:MENTIONS]-(d:Document)-[:MENTIONS]->(b:Entity {community_id: community_id})
+                WHERE a.id < b.id
+                WITH community_id, a, b, count(d) AS shared ORDER BY shared DESC
+                RETURN community_id, collect({source: a.name, target: b.name, shared: shared})[..$top_entities] AS pairs
+                """, community_ids=community_ids, top_entities=top_entities):
+                    if record["community_id"] in profiles:
+                        profiles[record["community_id"]]["pairs"] = record["pairs"]
+                
+                for record in session.run("""
+                UNWIND $community_ids AS community_id
+                MATCH (e:Entity {community_id: community_id})<-[m:MENTIONS]-(d:Document)
+                WITH community_id, d, sum(m.count) AS weight ORDER BY weight DESC
+                RETURN community_id, collect(d.key)[..$top_documents] AS documents
+                """, community_ids=community_ids, top_documents=top_documents):
+                    if record["community_id"] in profiles:
+                        profiles[record["community_id"]]["documents"] = record["documents"]
+                
+                return profiles
+        except Exception as e:
+            logger.error(f"Failed to get community profiles: {e}")
+            raise
+    
+    def save_communities(self, communities: list, tenant_id: Optional[str] = None):
+        """Store Community nodes (dicts with id, size and summary)"""
+        try:
+            with self.driver.session() as session:
+                query = """
+                UNWIND $communities AS community
+                MERGE (c:Community {id: community.id})
+                SET c.tenant_id = $tenant_id, c.size = community.size, c.summary = community.summary,
+                    c.updated_at = datetime()
+                """
+                session.execute_write(lambda tx: tx.run(query, communities=communities, tenant_id=tenant_id).consume())
+        except Exception as e:
+            logger.error(f"Failed to save communities: {e}")
+            raise
+    
+    def delete_communities(self, community_ids: list):
+        """Delete Community nodes"""
+        try:
+            with self.driver.session() as session:
+                query = "MATCH (c:Community) WHERE c.id IN $community_ids DETACH DELETE c"
+                session.execute_write(lambda tx: tx.run(query, community_ids=community_ids).consume())
+        except Exception as e:
+            logger.error(f"Failed to delete communities: {e}")
+            raise
+    
+    def get_orphan_communities(self, tenant_id: Optional[str] = None) -> list:
+        """IDs of a tenant's Community nodes that no entity belongs to any more"""
+        tenant_predicate = "c.tenant_id = $tenant_id" if tenant_id else "c.tenant_id IS NULL"
+        try:
+            with self.driver.session() as session:
+                result = session.run(f"""
+                MATCH (c:Community)
+                WHERE {tenant_predicate} AND NOT EXISTS {{ MATCH (e:Entity {{community_id: c.id}}) }}
+                RETURN c.id AS id
+                """, tenant_id=tenant_id)
+                return [record["id"] for record in result]
+        except Exception as e:
+            logger.error(f"Failed to find orphan communities: {e}")
+            raise
+    
+    def get_graph_counts(self) -> Dict[str, int]:
+        """Node counts per label and relationship counts per type, read from Neo4j's count store"""
+        with self.driver.session() as session:
+            labels = [record["label"] for record in session.run("CALL db.labels() YIELD label")]
+            rel_types = [record["relationshipType"]
+                         for record in session.run("CALL db.relationshipTypes() YIELD relationshipType")]
+            counts = {
+                "nodes": session.run("MATCH (n) RETURN count(n) AS count").single()["count"],
+                "relationships": session.run("MATCH ()-[r]->() RETURN count(r) AS count").single()["count"]
+            }
+            for label in labels:
+                counts[f":{label}"] = session.run(f"MATCH (n:`{label}`) RETURN count(n) AS count").single()["count"]
+            for rel_type in rel_types:
+                counts[f"[:{rel_type}]"] = session.run(
+                    f"MATCH ()-[r:`{rel_type}`]->() RETURN count(r) AS count"
+                ).single()["count"]
+            return counts
+
+    def iter_nodes(self, label: str, batch_size: int = 10000):
+        """Yield batches of the property maps of every node with a label"""
+        with self.driver.session() as session:
+            result = session.run(f"MATCH (n:{label}) RETURN properties(n) AS properties")
+            batch = []
+            for record in result:
+                batch.append(record["properties"])
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def iter_relationships(self, rel_type: str, start_label: str, start_key: str, end_label: str, end_key: str,
+                           batch_size: int = 10000):
+        """Yield batches of (start key, end key, properties) for every relationship of a type"""
+        with self.driver.session() as session:
+            result = session.run(f"""
+                MATCH (a:{start_label})-[r:{rel_type}]->(b:{end_label})
+                RETURN a.{start_key} AS start, b.{end_key} AS end, properties(r) AS properties
+            """)
+            batch = []
+            for record in result:
+                batch.append((record["start"], record["end"], record["properties"]))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def create_nodes(self, label: str, rows: list):
+        """Create nodes from property maps without matching existing ones (bulk restore)"""
+        try:
+            with self.driver.session() as session:
+                query = f"UNWIND $rows AS properties CREATE (n:{label}) SET n = properties"
+                session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+        except Exception as e:
+            logger.error(f"Failed to create {label} nodes: {e}")
+            raise
+
+    def create_relationships(self, rel_type: str, start_label: str, start_key: str, end_label: str, end_key: str,
+                             rows: list):
+        """Create relationships from dicts with start, end and properties (bulk restore)
+
+        Endpoints are looked up by their indexed key, so the nodes must
+        already exist.
+        """
+        try:
+            with self.driver.session() as session:
+                query = f"""
+                UNWIND $rows AS row
+                MATCH (a:{start_label} {{{start_key}: row.start}})
+                MATCH (b:{end_label} {{{end_key}: row.end}})
+                CREATE (a)-[r:{rel_type}]->(b)
+                SET r = row.properties
+                """
+                session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+        except Exception as e:
+            logger.error(f"Failed to create {rel_type} relationships: {e}")
+            raise
+
+    def clear_graph(self, batch_size: int = 10000) -> int:
+        """Delete every node and relationship, in batches; returns the number of nodes deleted"""
+        query = "MATCH (n) WITH n LIMIT $limit DETACH DELETE n RETURN count(n) AS deleted"
+        deleted = 0
+        with self.driver.session() as session:
+            while True:
+                count = session.execute_write(lambda tx: tx.run(query, limit=batch_size).single()["deleted"])
+                deleted += count
+                if count == 0:
+                    return deleted
+
     def get_database_info(self):
         """Get information about the database"""
         try:
@@ -178,6 +998,10 @@ class Neo4jManager:
             logger.error(f"Failed to get database info: {e}")
             return {"status": "error", "error": str(e)}
     
+    def ping(self):
+        """Raise if Neo4j is not reachable"""
+        self.driver.verify_connectivity()
+    
     def close(self):
         """Close the Neo4j driver"""
         if self.driver:
@@ -186,26 +1010,118 @@ class Neo4jManager:
 # Global database managers
 chroma_manager: Optional[ChromaDBManager] = None
 neo4j_manager: Optional[Neo4jManager] = None
+lexical_indexes: Dict[str, BM25Index] = {}
+embedding_cache: Optional[EmbeddingCache] = None
+_lexical_indexes_lock = threading.Lock()
+
+def _lexical_index_directory(tenant_id: Optional[str]) -> str:
+    """Directory holding a tenant's BM25 index"""
+    if not tenant_id:
+        return settings.BM25_INDEX_DIRECTORY
+    return os.path.join(settings.BM25_INDEX_DIRECTORY, "tenants", tenant_collection_name(tenant_id))
+
+def initialize_lexical_index(chroma: ChromaDBManager, tenant_id: Optional[str] = None) -> BM25Index:
+    """Open a tenant's BM25 index, backfilling it from ChromaDB if it is empty"""
+    index = BM25Index(
+        _lexical_index_directory(tenant_id),
+        k1=settings.BM25_K1,
+        b=settings.BM25_B,
+        flush_docs=settings.BM25_FLUSH_DOCS
+    )
+    
+    if index.count() == 0 and chroma.get_collection(tenant_id).count() > 0:
+        logger.info(f"BM25 index for {tenant_collection_name(tenant_id)} is empty, backfilling from ChromaDB...")
+        for ids, documents in chroma.iter_documents(tenant_id=tenant_id):
+            index.add_many(list(zip(ids, documents)))
+        index.flush()
+        logger.info(f"Backfilled BM25 index with {index.count()} documents")
+    
+    return index
+
+def initialize_embedding_cache() -> Optional[EmbeddingCache]:
+    """Open the embedding cache if enabled (safe to call from worker processes)"""
+    global embedding_cache
+    
+    if settings.EMBEDDING_CACHE_ENABLED and embedding_cache is None:
+        embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH)
+    return embedding_cache
+
+def initialize_chroma() -> ChromaDBManager:
+    """Open ChromaDB and the default BM25 index (raises on failure)"""
+    global chroma_manager
+    
+    if chroma_manager is None:
+        manager = ChromaDBManager()
+        if settings.HYBRID_SEARCH_ENABLED and "" not in lexical_indexes:
+            lexical_indexes[""] = initialize_lexical_index(manager)
+        chroma_manager = manager
+    return chroma_manager
+
+def initialize_neo4j() -> Neo4jManager:
+    """Connect to Neo4j (raises on failure)"""
+    global neo4j_manager
+    
+    if neo4j_manager is None:
+        neo4j_manager = Neo4jManager()
+    return neo4j_manager
 
 def initialize_databases():
     """Initialize both database managers"""
-    global chroma_manager, neo4j_manager
-    
     try:
-        chroma_manager = ChromaDBManager()
-        neo4j_manager = Neo4jManager()
+        initialize_chroma()
+        initialize_neo4j()
+        initialize_embedding_cache()
         logger.info("All databases initialized successfully")
         return True
     except Exception as e:
         logger.error(f"Failed to initialize databases: {e}")
         return False
 
+def close_databases():
+    """Flush the lexical indexes and close database connections"""
+    with _lexical_indexes_lock:
+        for index in lexical_indexes.values():
+            index.close()
+        lexical_indexes.clear()
+    if embedding_cache is not None:
+        embedding_cache.close()
+    if neo4j_manager is not None:
+        neo4j_manager.close()
+
 def get_chroma_manager() -> ChromaDBManager:
     """Get ChromaDB manager instance"""
     if chroma_manager is None:
         raise RuntimeError("ChromaDB manager not initialized")
     return chroma_manager
 
+def get_lexical_index(tenant_id: Optional[str] = None) -> Optional[BM25Index]:
+    """Get a tenant's BM25 index (None when hybrid search is disabled)"""
+    if not settings.HYBRID_SEARCH_ENABLED:
+        return None
+    
+    key = tenant_id or ""
+    index = lexical_indexes.get(key)
+    if index is None:
+        with _lexical_indexes_lock:
+            index = lexical_indexes.get(key)
+            if index is None:
+                index = initialize_lexical_index(get_chroma_manager(), tenant_id)
+                lexical_indexes[key] = index
+    return index
+
+def reset_lexical_index(tenant_id: Optional[str] = None):
+    """Close and delete a tenant's BM25 index so the next get_lexical_index rebuilds it from ChromaDB"""
+    with _lexical_indexes_lock:
+        index = lexical_indexes.pop(tenant_id or "", None)
+        if index is not None:
+            index.close()
+        # The default index's directory also holds tenants/, so only its own files go
+        remove_index_files(_lexical_index_directory(tenant_id))
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Get the embedding cache instance (None when caching is disabled)"""
+    return embedding_cache
+
 def get_neo4j_manager() -> Neo4jManager:
     """Get Neo4j manager instance"""
     if neo4j_manager is None:
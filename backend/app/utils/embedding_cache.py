@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 hex digest of a document's content"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model, content hash)
+
+    Vectors are stored as float32 blobs in SQLite, so re-embedding content
+    that was seen before (after a restart, a re-sync or a migration) is a
+    key lookup instead of a model forward pass.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._initialize()
+
+    def _initialize(self):
+        """Open the database and create the table"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Bulk-import workers share the file, so wait for other writers instead of failing
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, content_hash)
+                ) WITHOUT ROWID
+            """)
+            self._conn.commit()
+            logger.info(f"Embedding cache opened: {self.path}")
+        except Exception as e:
+            logger.error(f"Failed to initialize embedding cache: {e}")
+            raise
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the given content hashes"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? AND content_hash IN ({placeholders})",
+                    [model, *batch]
+                )
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]):
+        """Store vectors for the given content hashes"""
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, vector) VALUES (?, ?, ?)",
+                [(model, digest, np.asarray(vector, dtype=np.float32).tobytes()) for digest, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        """Number of cached vectors"""
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
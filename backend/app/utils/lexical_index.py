@@ -0,0 +1,471 @@
+import os
+import re
+import json
+import math
+import mmap
+import heapq
+import logging
+import itertools
+import threading
+from array import array
+from collections import Counter, defaultdict
+from typing import List, Dict, Tuple, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Keep identifiers such as "ERR-404", "SKU_1234" or "v2.1.0" as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[\-_.][a-z0-9]+)*")
+
+MAX_TERM_FREQUENCY = 0xFFFF
+
+# Postings buffered per array before a merge writes them to disk
+MERGE_CHUNK_POSTINGS = 1 << 20
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into lexical tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class _Segment:
+    """Immutable, memory-mapped postings segment
+
+    A segment is three files sharing a prefix:
+    - ``.terms``: JSON map of term -> [offset, length] into the postings arrays
+    - ``.docs``: uint32 document numbers, sorted ascending within each term
+    - ``.tfs``: uint16 term frequencies, parallel to ``.docs``
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        with open(f"{prefix}.terms", "r", encoding="utf-8") as f:
+            self.terms: Dict[str, List[int]] = json.load(f)
+        self._docs_file = open(f"{prefix}.docs", "rb")
+        self._tfs_file = open(f"{prefix}.tfs", "rb")
+        self._docs_map = self._map(self._docs_file)
+        self._tfs_map = self._map(self._tfs_file)
+        self.docs = memoryview(self._docs_map).cast("I")
+        self.tfs = memoryview(self._tfs_map).cast("H")
+
+    @staticmethod
+    def _map(f):
+        """Memory-map a file read-only (mmap rejects empty files)"""
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def write(prefix: str, postings: Dict[str, List[Tuple[int, int]]]):
+        """Write postings (term -> [(doc_no, tf), ...]) as a new segment"""
+        terms = {}
+        docs = array("I")
+        tfs = array("H")
+        for term in sorted(postings):
+            entries = postings[term]
+            terms[term] = [len(docs), len(entries)]
+            for doc_no, tf in entries:
+                docs.append(doc_no)
+                tfs.append(min(tf, MAX_TERM_FREQUENCY))
+
+        with open(f"{prefix}.docs", "wb") as f:
+            docs.tofile(f)
+        with open(f"{prefix}.tfs", "wb") as f:
+            tfs.tofile(f)
+        _Segment._write_terms(prefix, terms)
+
+    @staticmethod
+    def _write_terms(prefix: str, terms: Dict[str, List[int]]):
+        """Write the term dictionary last, so a segment is only visible once complete"""
+        with open(f"{prefix}.terms.tmp", "w", encoding="utf-8") as f:
+            json.dump(terms, f, separators=(",", ":"))
+        os.replace(f"{prefix}.terms.tmp", f"{prefix}.terms")
+
+    @staticmethod
+    def merge(prefix: str, segments: List["_Segment"], deleted: Set[int]):
+        """Write the postings of several segments as one new segment, dropping deleted documents
+
+        Each segment's term dictionary is sorted, so terms are merged k-way
+        and every term's postings are concatenated in segment order (document
+        numbers stay ascending). Postings are streamed to disk in chunks; only
+        the new term dictionary is held in memory.
+        """
+        terms = {}
+        docs = array("I")
+        tfs = array("H")
+        written = 0
+        with open(f"{prefix}.docs", "wb") as docs_file, open(f"{prefix}.tfs", "wb") as tfs_file:
+            for term, _ in itertools.groupby(heapq.merge(*(segment.terms for segment in segments))):
+                start = written + len(docs)
+                for segment in segments:
+                    doc_nos, term_tfs = segment.postings(term)
+                    if not deleted:
+                        docs.frombytes(doc_nos.cast("B"))
+                        tfs.frombytes(term_tfs.cast("B"))
+                    else:
+                        for doc_no, tf in zip(doc_nos, term_tfs):
+                            if doc_no not in deleted:
+                                docs.append(doc_no)
+                                tfs.append(tf)
+                    doc_nos.release()
+                    term_tfs.release()
+
+                length = written + len(docs) - start
+                if length:
+                    terms[term] = [start, length]
+                if len(docs) >= MERGE_CHUNK_POSTINGS:
+                    docs.tofile(docs_file)
+                    tfs.tofile(tfs_file)
+                    written += len(docs)
+                    docs = array("I")
+                    tfs = array("H")
+
+            docs.tofile(docs_file)
+            tfs.tofile(tfs_file)
+        _Segment._write_terms(prefix, terms)
+
+    def postings(self, term: str) -> Tuple[memoryview, memoryview]:
+        """Return the (doc_nos, tfs) views for a term"""
+        entry = self.terms.get(term)
+        if entry is None:
+            return memoryview(b"").cast("I"), memoryview(b"").cast("H")
+        offset, length = entry
+        return self.docs[offset:offset + length], self.tfs[offset:offset + length]
+
+    def close(self):
+        """Release the memory maps"""
+        self.docs.release()
+        self.tfs.release()
+        if isinstance(self._docs_map, mmap.mmap):
+            self._docs_map.close()
+        if isinstance(self._tfs_map, mmap.mmap):
+            self._tfs_map.close()
+        self._docs_file.close()
+        self._tfs_file.close()
+
+    def remove_files(self):
+        """Delete the segment files from disk"""
+        for suffix in (".terms", ".docs", ".tfs"):
+            try:
+                os.remove(f"{self.prefix}{suffix}")
+            except FileNotFoundError:
+                pass
+
+
+class BM25Index:
+    """Incremental on-disk BM25 inverted index
+
+    New documents are appended to a write-ahead log and buffered in memory.
+    Once the buffer reaches ``flush_docs`` documents it is written out as an
+    immutable memory-mapped segment; segments are merged when there are more
+    than ``max_segments`` of them. Document numbers are assigned in insertion
+    order, so merging is a per-term concatenation. Deleted documents are
+    tombstoned, skipped at query time and dropped from postings on merge.
+
+    The WAL and document tables are only consistent with a single writer, so
+    an index directory is locked (``index.lock``) by the process that opens
+    it; a second process fails instead of corrupting it.
+    """
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75,
+                 flush_docs: int = 256, max_segments: int = 8):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.flush_docs = flush_docs
+        self.max_segments = max_segments
+
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._next_segment = 0
+        self._doc_ids: List[str] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._deleted: Set[int] = set()
+        self._doc_lengths = array("I")
+        self._total_length = 0
+        self._buffer: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._buffered_docs = 0
+
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self._doc_ids_path = os.path.join(directory, "doc_ids.txt")
+        self._doc_lengths_path = os.path.join(directory, "doc_lengths.u32")
+        self._wal_path = os.path.join(directory, "pending.jsonl")
+        self._deleted_path = os.path.join(directory, "deleted.u32")
+        self._lock_file = None
+
+        self._initialize()
+
+    def _initialize(self):
+        """Load the manifest, segments and pending documents from disk"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._acquire_directory_lock()
+
+            segment_names: List[str] = []
+            if os.path.exists(self._manifest_path):
+                with open(self._manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                segment_names = manifest.get("segments", [])
+                self._next_segment = manifest.get("next_segment", 0)
+                indexed_docs = manifest.get("doc_count", 0)
+            else:
+                indexed_docs = 0
+
+            if os.path.exists(self._doc_ids_path):
+                with open(self._doc_ids_path, "r", encoding="utf-8") as f:
+                    self._doc_ids = [line.rstrip("\n") for line in f][:indexed_docs]
+            if os.path.exists(self._doc_lengths_path):
+                with open(self._doc_lengths_path, "rb") as f:
+                    self._doc_lengths.frombytes(f.read(indexed_docs * self._doc_lengths.itemsize))
+            self._total_length = sum(self._doc_lengths)
+            self._doc_numbers = {doc_id: doc_no for doc_no, doc_id in enumerate(self._doc_ids)}
+
+            for name in segment_names:
+                self._segments.append(_Segment(os.path.join(self.directory, name)))
+
+            # Drop anything written after the last manifest update, then replay the WAL
+            self._truncate_doc_tables(indexed_docs)
+            self._replay_wal()
+            
+            if os.path.exists(self._deleted_path):
+                deleted = array("I")
+                with open(self._deleted_path, "rb") as f:
+                    deleted.frombytes(f.read())
+                self._deleted = {doc_no for doc_no in deleted if doc_no < len(self._doc_lengths)}
+                self._total_length -= sum(self._doc_lengths[doc_no] for doc_no in self._deleted)
+
+            logger.info(f"BM25 index loaded: {len(self._doc_ids)} documents, {len(self._segments)} segments")
+
+        except Exception as e:
+            logger.error(f"Failed to initialize BM25 index: {e}")
+            raise
+
+    def _acquire_directory_lock(self):
+        """Take an exclusive lock on the index directory, failing fast if another process holds it"""
+        self._lock_file = open(os.path.join(self.directory, "index.lock"), "a")
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(f"BM25 index {self.directory} is open in another process "
+                               f"(stop the API before running a bulk import or restore)")
+
+    def _truncate_doc_tables(self, doc_count: int):
+        """Truncate the on-disk document tables to the manifest's document count"""
+        with open(self._doc_ids_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{doc_id}\n" for doc_id in self._doc_ids[:doc_count])
+        with open(self._doc_lengths_path, "wb") as f:
+            self._doc_lengths[:doc_count].tofile(f)
+
+    def _replay_wal(self):
+        """Re-buffer documents that were added but not yet flushed to a segment"""
+        if not os.path.exists(self._wal_path):
+            return
+        with open(self._wal_path, "r", encoding="utf-8") as f:
+            pending = [json.loads(line) for line in f if line.strip()]
+        for entry in pending:
+            # Entries below the manifest's document count were already flushed
+            if entry["n"] >= len(self._doc_ids):
+                self._buffer_document(entry["id"], entry["tf"])
+
+    def _buffer_document(self, doc_id: str, term_freqs: Dict[str, int]):
+        """Assign a document number and add the document's postings to the buffer"""
+        doc_no = len(self._doc_ids)
+        length = sum(term_freqs.values())
+        self._doc_ids.append(doc_id)
+        self._doc_numbers[doc_id] = doc_no
+        self._doc_lengths.append(length)
+        self._total_length += length
+        for term, tf in term_freqs.items():
+            self._buffer[term].append((doc_no, tf))
+        self._buffered_docs += 1
+
+    def add(self, doc_id: str, text: str):
+        """Index a single document"""
+        self.add_many([(doc_id, text)])
+
+    def add_many(self, documents: List[Tuple[str, str]]):
+        """Index a batch of (doc_id, text) pairs"""
+        try:
+            with self._lock:
+                with open(self._wal_path, "a", encoding="utf-8") as wal:
+                    for doc_id, text in documents:
+                        term_freqs = dict(Counter(tokenize(text)))
+                        entry = {"n": len(self._doc_ids), "id": doc_id, "tf": term_freqs}
+                        wal.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                        self._buffer_document(doc_id, term_freqs)
+
+                if self._buffered_docs >= self.flush_docs:
+                    self.flush()
+        except Exception as e:
+            logger.error(f"Failed to add documents to BM25 index: {e}")
+            raise
+
+    def delete(self, doc_ids: List[str]) -> int:
+        """Tombstone documents so they no longer match; returns how many were live"""
+        try:
+            with self._lock:
+                doc_nos = array("I")
+                for doc_id in doc_ids:
+                    doc_no = self._doc_numbers.pop(doc_id, None)
+                    if doc_no is not None and doc_no not in self._deleted:
+                        doc_nos.append(doc_no)
+                if doc_nos:
+                    with open(self._deleted_path, "ab") as f:
+                        doc_nos.tofile(f)
+                    self._deleted.update(doc_nos)
+                    self._total_length -= sum(self._doc_lengths[doc_no] for doc_no in doc_nos)
+                return len(doc_nos)
+        except Exception as e:
+            logger.error(f"Failed to delete documents from BM25 index: {e}")
+            raise
+    
+    def flush(self):
+        """Write buffered postings to a new segment and clear the WAL"""
+        with self._lock:
+            if not self._buffered_docs:
+                return
+
+            name = f"seg_{self._next_segment:06d}"
+            self._next_segment += 1
+            prefix = os.path.join(self.directory, name)
+            _Segment.write(prefix, self._buffer)
+
+            flushed_from = len(self._doc_ids) - self._buffered_docs
+            with open(self._doc_ids_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{doc_id}\n" for doc_id in self._doc_ids[flushed_from:])
+            with open(self._doc_lengths_path, "ab") as f:
+                self._doc_lengths[flushed_from:].tofile(f)
+
+            self._segments.append(_Segment(prefix))
+            # The manifest's doc_count must include the documents just flushed
+            self._buffer = defaultdict(list)
+            self._buffered_docs = 0
+            self._write_manifest()
+            open(self._wal_path, "w").close()
+
+            if len(self._segments) > self.max_segments:
+                self._merge_segments()
+
+    def _merge_segments(self):
+        """Merge all segments into one"""
+        name = f"seg_{self._next_segment:06d}"
+        self._next_segment += 1
+        prefix = os.path.join(self.directory, name)
+        _Segment.merge(prefix, self._segments, self._deleted)
+
+        old_segments = self._segments
+        self._segments = [_Segment(prefix)]
+        self._write_manifest()
+
+        for segment in old_segments:
+            segment.close()
+            segment.remove_files()
+        logger.info(f"Merged {len(old_segments)} BM25 segments into {name}")
+
+    def _write_manifest(self):
+        """Atomically persist the list of live segments"""
+        manifest = {
+            "segments": [os.path.basename(s.prefix) for s in self._segments],
+            "next_segment": self._next_segment,
+            "doc_count": len(self._doc_ids) - self._buffered_docs,
+        }
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return the top-k (doc_id, bm25_score) pairs for a query"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            doc_count = len(self._doc_ids) - len(self._deleted)
+            if doc_count <= 0:
+                return []
+            avg_length = self._total_length / doc_count
+            k1, b = self.k1, self.b
+            lengths = self._doc_lengths
+            deleted = self._deleted
+            scores: Dict[int, float] = defaultdict(float)
+
+            for term in terms:
+                sources = []
+                for segment in self._segments:
+                    doc_nos, tfs = segment.postings(term)
+                    if len(doc_nos):
+                        sources.append((doc_nos, tfs))
+                buffered = self._buffer.get(term)
+                if buffered:
+                    sources.append(([d for d, _ in buffered], [t for _, t in buffered]))
+
+                # Tombstoned documents are out of doc_count, so they must not count towards df either
+                postings = [
+                    (doc_no, tf)
+                    for doc_nos, tfs in sources
+                    for doc_no, tf in zip(doc_nos, tfs)
+                    if doc_no not in deleted
+                ]
+                df = len(postings)
+                if not df:
+                    continue
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+                for doc_no, tf in postings:
+                    norm = k1 * (1 - b + b * lengths[doc_no] / avg_length)
+                    scores[doc_no] += idf * tf * (k1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._doc_ids[doc_no], score) for doc_no, score in top]
+
+    def count(self) -> int:
+        """Number of live indexed documents"""
+        return len(self._doc_ids) - len(self._deleted)
+
+    def get_info(self) -> Dict[str, int]:
+        """Get information about the index"""
+        with self._lock:
+            return {
+                "document_count": len(self._doc_ids) - len(self._deleted),
+                "deleted_documents": len(self._deleted),
+                "segment_count": len(self._segments),
+                "buffered_documents": self._buffered_docs,
+            }
+
+    def close(self):
+        """Flush pending documents and release the segment maps and directory lock"""
+        with self._lock:
+            self.flush()
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+def remove_index_files(directory: str):
+    """Delete a closed index's files, leaving subdirectories (tenant indexes nest under the default one) alone"""
+    if not os.path.isdir(directory):
+        return
+    for entry in os.scandir(directory):
+        if entry.is_file(follow_symlinks=False):
+            os.remove(entry.path)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked id lists into one, scoring each id by sum(1 / (k + rank))"""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
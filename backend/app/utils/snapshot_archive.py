@@ -0,0 +1,280 @@
+import os
+import mmap
+import zlib
+import struct
+import tempfile
+import logging
+from array import array
+from typing import Dict, Any, List, Iterator, Optional
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GRAGSNAP"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sII")  # magic, format version, reserved
+FOOTER = struct.Struct("<QQ8s")  # manifest offset, manifest length, magic
+ALIGNMENT = 64
+COPY_CHUNK = 16 * 1024 * 1024
+
+
+class _Column:
+    """Fixed-width column spooled to a temporary file until it is copied into the archive"""
+
+    def __init__(self, directory: str, dtype):
+        self.dtype = np.dtype(dtype)
+        self.shape: List[int] = [0]
+        self._file = tempfile.TemporaryFile(dir=directory)
+
+    def append(self, values):
+        """Append rows (a 1-D array, or a 2-D array of equal-width rows)"""
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        if self.shape[0] == 0:
+            self.shape = [0, *values.shape[1:]]
+        elif list(values.shape[1:]) != self.shape[1:]:
+            raise ValueError(f"Expected rows of shape {self.shape[1:]}, got {list(values.shape[1:])}")
+        self._file.write(values.data)
+        self.shape[0] += len(values)
+
+    def close(self):
+        """Remove the spool file"""
+        self._file.close()
+
+
+class _StringColumn:
+    """Variable-length column: concatenated UTF-8 bytes plus uint64 end offsets"""
+
+    def __init__(self, directory: str):
+        self.data = _Column(directory, np.uint8)
+        self.offsets = array("Q", [0])
+
+    def append(self, values: List[bytes]):
+        """Append encoded values"""
+        end = self.offsets[-1]
+        for value in values:
+            end += len(value)
+            self.offsets.append(end)
+        self.data.append(np.frombuffer(b"".join(values), dtype=np.uint8))
+
+    def append_strings(self, values: List[Optional[str]]):
+        """Append text (None is stored as an empty string)"""
+        self.append([(value or "").encode("utf-8") for value in values])
+
+    def append_json(self, values: list, default=None):
+        """Append JSON-encoded values"""
+        self.append([orjson.dumps(value, default=default) for value in values])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def close(self):
+        """Remove the spool file"""
+        self.data.close()
+
+
+class SnapshotWriter:
+    """Writes a snapshot archive
+
+    Layout: a header (magic, format version), then 64-byte aligned array
+    sections, then a JSON manifest describing every section (offset, length,
+    dtype, shape, CRC32) and a fixed-size footer pointing at the manifest.
+    Columns are spooled to temporary files while the stores are read, so
+    snapshot memory use does not depend on store size. The archive is
+    written to ``<path>.tmp`` and only renamed into place once complete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(self.directory, exist_ok=True)
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+
+    def column(self, dtype) -> _Column:
+        """New fixed-width column"""
+        return _Column(self.directory, dtype)
+
+    def string_column(self) -> _StringColumn:
+        """New variable-length column"""
+        return _StringColumn(self.directory)
+
+    def _align(self):
+        padding = -self._file.tell() % ALIGNMENT
+        if padding:
+            self._file.write(b"\0" * padding)
+
+    def write_column(self, column) -> Dict[str, Any]:
+        """Copy a spooled column into the archive and return its section descriptor"""
+        if isinstance(column, _StringColumn):
+            section = {
+                "data": self.write_column(column.data),
+                "offsets": self.write_array(np.frombuffer(column.offsets, dtype=np.uint64))
+            }
+            column.close()
+            return section
+
+        self._align()
+        offset = self._file.tell()
+        crc = 0
+        column._file.seek(0)
+        while True:
+            chunk = column._file.read(COPY_CHUNK)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            self._file.write(chunk)
+        column.close()
+        return {"offset": offset, "length": self._file.tell() - offset, "dtype": column.dtype.str,
+                "shape": column.shape, "crc32": crc}
+
+    def write_array(self, values: np.ndarray) -> Dict[str, Any]:
+        """Write an in-memory array and return its section descriptor"""
+        values = np.ascontiguousarray(values)
+        self._align()
+        offset = self._file.tell()
+        self._file.write(values.data)
+        return {"offset": offset, "length": values.nbytes, "dtype": values.dtype.str,
+                "shape": list(values.shape), "crc32": zlib.crc32(values.data)}
+
+    def close(self, manifest: Dict[str, Any]):
+        """Write the manifest and footer, then atomically move the archive into place"""
+        manifest = {"format_version": FORMAT_VERSION, **manifest}
+        self._align()
+        manifest_offset = self._file.tell()
+        encoded = orjson.dumps(manifest)
+        self._file.write(encoded)
+        self._file.write(FOOTER.pack(manifest_offset, len(encoded), MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard a partially written archive"""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is not None or not self._file.closed:
+            self.abort()
+
+
+class StringTable:
+    """Lazily decoded view of a variable-length column"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._view = memoryview(data)
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _slices(self, start: int, stop: int) -> Iterator[memoryview]:
+        bounds = self._offsets[start:stop + 1].tolist()
+        for begin, end in zip(bounds, bounds[1:]):
+            yield self._view[begin:end]
+
+    def strings(self, start: int, stop: int) -> List[str]:
+        """Decode rows [start, stop) as text"""
+        return [str(value, "utf-8") for value in self._slices(start, stop)]
+
+    def json(self, start: int, stop: int, object_hook=None) -> list:
+        """Decode rows [start, stop) as JSON, passing each value through object_hook if given"""
+        values = [orjson.loads(value) for value in self._slices(start, stop)]
+        return [object_hook(value) for value in values] if object_hook else values
+
+
+class SnapshotReader:
+    """Read-only, memory-mapped view of a snapshot archive
+
+    Arrays are returned as views into the mapping, so restoring a large
+    collection pages embeddings in from disk batch by batch instead of
+    loading the archive into memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size < HEADER.size + FOOTER.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a snapshot archive")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _ = HEADER.unpack_from(self._map, 0)
+        manifest_offset, manifest_length, footer_magic = FOOTER.unpack_from(self._map, self.size - FOOTER.size)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a snapshot archive")
+        if version > FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} has snapshot format version {version}; this version reads up to {FORMAT_VERSION}")
+        if footer_magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is truncated (no footer)")
+
+        self.version = version
+        self.manifest: Dict[str, Any] = orjson.loads(self._map[manifest_offset:manifest_offset + manifest_length])
+
+    def array(self, section: Dict[str, Any]) -> np.ndarray:
+        """Zero-copy view of an array section"""
+        count = int(np.prod(section["shape"]))
+        values = np.frombuffer(self._map, dtype=np.dtype(section["dtype"]), count=count, offset=section["offset"])
+        return values.reshape(section["shape"])
+
+    def strings(self, section: Dict[str, Any]) -> StringTable:
+        """View of a variable-length column"""
+        return StringTable(self.array(section["data"]), self.array(section["offsets"]))
+
+    def verify(self) -> List[str]:
+        """Check every section's CRC32; return descriptions of the corrupt ones"""
+        corrupt = []
+        for path, section in iter_sections(self.manifest):
+            view = memoryview(self._map)[section["offset"]:section["offset"] + section["length"]]
+            try:
+                crc = 0
+                for start in range(0, len(view), COPY_CHUNK):
+                    crc = zlib.crc32(view[start:start + COPY_CHUNK], crc)
+            finally:
+                view.release()
+            if crc != section["crc32"]:
+                corrupt.append(path)
+        return corrupt
+
+    def close(self):
+        """Unmap the archive (views still in use keep the mapping alive until released)"""
+        try:
+            self._map.close()
+        except BufferError:
+            logger.debug(f"Snapshot {self.path} still has live views; leaving it mapped")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_sections(node, path: str = ""):
+    """Yield (path, descriptor) for every array section in a manifest"""
+    if isinstance(node, dict):
+        if "crc32" in node and "offset" in node:
+            yield path, node
+            return
+        for key, value in node.items():
+            yield from iter_sections(value, f"{path}.{key}" if path else key)
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            yield from iter_sections(value, f"{path}[{i}]")
@@ -0,0 +1,118 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Callable
+
+from .config import settings
+from .database import initialize_chroma, initialize_neo4j
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class StoreSupervisor:
+    """Connects the stores concurrently in the background and keeps them connected
+
+    Each store has its own task: it connects with exponential backoff (plus
+    jitter) and then pings the store every STORE_HEALTH_INTERVAL seconds,
+    marking it unready and backing off again when a ping fails. The API is
+    ready only while every store is.
+    """
+
+    def __init__(self, stores: Dict[str, Callable[[], Any]]):
+        self.stores = stores
+        self.ready: Dict[str, bool] = {name: False for name in stores}
+        self.errors: Dict[str, Optional[str]] = {name: None for name in stores}
+        self._managers: Dict[str, Any] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._started_at: Optional[float] = None
+        self.time_to_ready: Optional[float] = None
+
+    def start(self):
+        """Start connecting every store without blocking startup"""
+        self._started_at = time.monotonic()
+        for name in self.stores:
+            self._tasks[name] = asyncio.create_task(self._supervise(name), name=f"store-{name}")
+
+    async def stop(self):
+        """Cancel the supervision tasks"""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def is_ready(self) -> bool:
+        """Whether every store is connected"""
+        return all(self.ready.values())
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every store is connected"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.is_ready():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def _supervise(self, name: str):
+        """Connect one store with backoff, then watch it"""
+        delay = settings.STORE_CONNECT_INITIAL_DELAY
+        attempt = 0
+        while True:
+            try:
+                if name not in self._managers:
+                    attempt += 1
+                    self._managers[name] = await asyncio.to_thread(self.stores[name])
+                else:
+                    await asyncio.to_thread(self._managers[name].ping)
+
+                if not self.ready[name]:
+                    self._mark_ready(name)
+                delay = settings.STORE_CONNECT_INITIAL_DELAY
+                await asyncio.sleep(settings.STORE_HEALTH_INTERVAL)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.ready[name]:
+                    logger.error(f"Lost connection to {name}: {e}")
+                self.ready[name] = False
+                self.errors[name] = str(e)
+                wait = delay * random.uniform(0.5, 1.0)
+                logger.warning(f"{name} not available (attempt {attempt}), retrying in {wait:.1f}s: {e}")
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, settings.STORE_CONNECT_MAX_DELAY)
+
+    def _mark_ready(self, name: str):
+        """Record a store as connected, and the time-to-ready once all are"""
+        self.ready[name] = True
+        self.errors[name] = None
+        elapsed = time.monotonic() - self._started_at
+        if self.time_to_ready is not None:
+            logger.info(f"{name} reconnected")
+            return
+        logger.info(f"{name} ready after {elapsed:.2f}s")
+        if self.is_ready():
+            self.time_to_ready = elapsed
+            logger.info(f"All stores ready after {elapsed:.2f}s")
+
+    def get_info(self) -> Dict[str, Any]:
+        """Readiness of every store"""
+        return {
+            "ready": self.is_ready(),
+            "time_to_ready": round(self.time_to_ready, 3) if self.time_to_ready is not None else None,
+            "stores": {name: {"ready": self.ready[name], "error": self.errors[name]} for name in self.stores}
+        }
+
+
+# Global supervisor
+store_supervisor: Optional[StoreSupervisor] = None
+
+
+def get_store_supervisor() -> StoreSupervisor:
+    """Get the process-wide store supervisor"""
+    global store_supervisor
+    if store_supervisor is None:
+        store_supervisor = StoreSupervisor({"chroma": initialize_chroma, "neo4j": initialize_neo4j})
+    return store_supervisor
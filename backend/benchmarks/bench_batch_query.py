@@ -0,0 +1,58 @@
+"""
+Compare queries/sec for the batch query path against a single-query loop.
+
+The queries file is JSONL with one {"query": ...} object per line (any other
+QueryRequest fields such as max_results, filters or tenant_id are honoured).
+
+Usage (from backend/, with the databases reachable):
+
+    python -m benchmarks.bench_batch_query --queries queries.jsonl
+    python -m benchmarks.bench_batch_query --queries queries.jsonl --retrieval-only
+"""
+import argparse
+import time
+
+from app.utils.database import initialize_databases
+from app.services.graph_rag_service import GraphRAGService
+from .common import load_jsonl, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", required=True, help="JSONL file of query requests")
+    parser.add_argument("--limit", type=int, default=500, help="Maximum number of queries to run")
+    parser.add_argument("--concurrency", type=int, default=None, help="Batch LLM concurrency")
+    parser.add_argument("--retrieval-only", action="store_true",
+                        help="Replace the LLM call with a no-op to measure retrieval alone")
+    args = parser.parse_args()
+
+    if not initialize_databases():
+        raise SystemExit("Could not initialize databases")
+    service = GraphRAGService()
+    if args.retrieval_only:
+        service._generate_answer = lambda query, context: ""
+
+    requests = list(load_jsonl(args.queries))[:args.limit]
+    # Load the models before timing either path
+    service.process_query(requests[0]["query"])
+
+    start = time.perf_counter()
+    for request in requests:
+        service.process_query(**request)
+    loop_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    errors = sum(isinstance(result, Exception) for _, result in service.process_queries(requests, args.concurrency))
+    batch_elapsed = time.perf_counter() - start
+
+    rows = {
+        "single-query loop": {"seconds": loop_elapsed, "queries/s": len(requests) / loop_elapsed},
+        "batch": {"seconds": batch_elapsed, "queries/s": len(requests) / batch_elapsed},
+    }
+    mode = "retrieval only" if args.retrieval_only else "end to end"
+    print_table(f"{len(requests)} queries, {mode} ({errors} batch errors)", rows)
+    print(f"\nSpeedup: {loop_elapsed / batch_elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
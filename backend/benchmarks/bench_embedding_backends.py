@@ -0,0 +1,92 @@
+"""
+Compare the torch and int8 ONNX embedding backends on CPU.
+
+Each backend runs in its own process so peak RSS is measured independently.
+Reports sentences/sec and peak RSS per backend, plus the cosine agreement
+between the two backends' embeddings of the same sentences. Exits non-zero
+if the minimum cosine falls below --min-cosine, so it doubles as a parity check.
+
+Usage (from backend/):
+
+    python -m benchmarks.bench_embedding_backends --sentences corpus.txt --threads 4
+"""
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+
+import numpy as np
+
+from app.utils.config import settings
+from .common import print_table
+
+SAMPLE_SENTENCES = [
+    "Error code ERR-4012 indicates the payment gateway rejected the card.",
+    "The supplier agreement renews automatically unless terminated 90 days in advance.",
+    "Neo4j stores entities and their relationships as a property graph.",
+    "Quarterly revenue grew 12 percent, driven by the EMEA region.",
+    "Reset the device by holding the power button for ten seconds.",
+]
+
+
+def run_backend(backend: str, model: str, threads: int, sentences, batch_size: int, queue):
+    """Load a backend, embed the sentences and report throughput and peak RSS"""
+    from app.services.embeddings import create_embedding_backend
+
+    encoder = create_embedding_backend(model, backend=backend, threads=threads)
+    encoder.encode(sentences[:batch_size], batch_size=batch_size)  # warmup
+
+    start = time.perf_counter()
+    embeddings = encoder.encode(sentences, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((backend, len(sentences) / elapsed, peak_rss_mb, np.asarray(embeddings, dtype=np.float32)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sentences", help="Text file with one sentence per line (default: built-in sample)")
+    parser.add_argument("--repeat", type=int, default=200, help="Times to repeat the built-in sample")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL, help="Embedding model name")
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_THREADS, help="Threads per backend (0 = default)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Minimum acceptable per-sentence cosine")
+    args = parser.parse_args()
+
+    if args.sentences:
+        with open(args.sentences, "r", encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+    else:
+        sentences = SAMPLE_SENTENCES * args.repeat
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    results = {}
+    for backend in ("torch", "onnx"):
+        process = ctx.Process(target=run_backend, args=(backend, args.model, args.threads, sentences, args.batch_size, queue))
+        process.start()
+        name, throughput, rss, embeddings = queue.get()
+        process.join()
+        results[name] = (throughput, rss, embeddings)
+
+    print_table(
+        f"{args.model}: {len(sentences)} sentences, threads={args.threads or 'default'}",
+        {name: {"sentences/s": t, "peak_rss_mb": r} for name, (t, r, _) in results.items()}
+    )
+
+    torch_emb, onnx_emb = results["torch"][2], results["onnx"][2]
+    cosines = (torch_emb * onnx_emb).sum(axis=1) / (
+        np.linalg.norm(torch_emb, axis=1) * np.linalg.norm(onnx_emb, axis=1)
+    )
+    print(f"\nCosine agreement torch vs onnx: mean={cosines.mean():.4f} min={cosines.min():.4f}")
+
+    if cosines.min() < args.min_cosine:
+        print(f"FAIL: minimum cosine {cosines.min():.4f} < {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
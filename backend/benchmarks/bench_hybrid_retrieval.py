@@ -0,0 +1,66 @@
+"""
+Compare vector-only retrieval with hybrid (BM25 + vector, RRF-fused) retrieval.
+
+The eval file is JSONL with one labelled query per line:
+
+    {"query": "What does ERR-4012 mean?", "relevant_ids": ["<chroma document id>", ...]}
+
+Usage (from backend/, with the databases reachable):
+
+    python -m benchmarks.bench_hybrid_retrieval --eval-file eval.jsonl --k 5
+"""
+import argparse
+
+from app.utils.database import initialize_databases, get_lexical_index
+from app.services.graph_rag_service import GraphRAGService
+from .common import load_jsonl, timed, latency_summary, print_table
+
+
+def recall_at_k(retrieved_ids, relevant_ids) -> float:
+    """Fraction of relevant ids present in the retrieved list"""
+    relevant = set(relevant_ids)
+    if not relevant:
+        return 0.0
+    return len(relevant.intersection(retrieved_ids)) / len(relevant)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--eval-file", required=True, help="JSONL file of {query, relevant_ids}")
+    parser.add_argument("--k", type=int, default=5, help="Number of results to retrieve")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed warmup queries per mode")
+    args = parser.parse_args()
+
+    if not initialize_databases():
+        raise SystemExit("Could not initialize databases")
+    service = GraphRAGService()
+    if get_lexical_index() is None:
+        raise SystemExit("HYBRID_SEARCH_ENABLED is false; nothing to compare against")
+
+    examples = list(load_jsonl(args.eval_file))
+    modes = {
+        "vector-only": service._vector_search,
+        "hybrid (bm25+rrf)": service._semantic_search,
+    }
+
+    rows = {}
+    for name, search in modes.items():
+        for example in examples[:args.warmup]:
+            search(example["query"], args.k)
+
+        latencies, recalls = [], []
+        for example in examples:
+            results, elapsed = timed(search, example["query"], args.k)
+            latencies.append(elapsed)
+            recalls.append(recall_at_k([r["id"] for r in results], example.get("relevant_ids", [])))
+
+        rows[name] = {
+            **latency_summary(latencies),
+            f"recall@{args.k}": sum(recalls) / len(recalls) if recalls else 0.0,
+        }
+
+    print_table(f"Retrieval over {len(examples)} queries (k={args.k})", rows)
+
+
+if __name__ == "__main__":
+    main()
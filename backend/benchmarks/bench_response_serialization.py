@@ -0,0 +1,115 @@
+"""
+Microbenchmark the query response path on large graph contexts.
+
+Builds a synthetic query_entities result with --edges relationships (10k by
+default) and times turning it into an HTTP response body two ways:
+
+- pydantic: an Entity/Relationship model per row, GraphContext.dict() into
+  QueryResponse, FastAPI's response_model validation and serialisation,
+  then JSONResponse (the path before records)
+- records: slotted records from GraphRAGService._build_graph_context,
+  to_dict() and ORJSONResponse (the current path)
+
+Needs no databases or models.
+
+Usage (from backend/):
+
+    python -m benchmarks.bench_response_serialization --edges 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.schemas import QueryResponse, GraphContext, Entity, Relationship
+from app.models.records import QueryResult
+from app.services.graph_rag_service import GraphRAGService
+from .common import latency_summary, print_table
+
+
+def synthetic_rows(edges: int, fanout: int):
+    """query_entities-shaped rows: edges // fanout source entities with fanout neighbours each"""
+    def entity(i):
+        return {"id": f"entity_{i:08x}", "name": f"Entity {i}", "type": "GENERAL",
+                "tenant_id": "bench", "mention_count": i % 17 + 1, "community_id": f"community_{i % 50:04x}"}
+
+    rows = []
+    for source in range(max(1, edges // fanout)):
+        for j in range(fanout):
+            rows.append({
+                "e": entity(source),
+                "r": {"type": "RELATES_TO", "mention_count": j % 5 + 1},
+                "related": entity(100000 + source * fanout + j)
+            })
+    return rows
+
+
+def pydantic_context(rows):
+    """Graph context built the pre-records way: one pydantic model per row"""
+    entities, relationships, seen = [], [], set()
+    for record in rows:
+        entity_data = record["e"]
+        if entity_data["id"] not in seen:
+            entities.append(Entity(id=entity_data["id"], name=entity_data["name"], type=entity_data["type"],
+                                   properties={k: v for k, v in entity_data.items() if k not in ["id", "name", "type"]}))
+            seen.add(entity_data["id"])
+        related_data, rel_data = record["related"], record["r"]
+        if related_data["id"] not in seen:
+            entities.append(Entity(id=related_data["id"], name=related_data["name"], type=related_data["type"],
+                                   properties={k: v for k, v in related_data.items() if k not in ["id", "name", "type"]}))
+            seen.add(related_data["id"])
+        relationships.append(Relationship(source_id=entity_data["id"], target_id=related_data["id"],
+                                          relationship_type=rel_data["type"],
+                                          properties={k: v for k, v in rel_data.items() if k not in ["type"]}))
+    return GraphContext(entities=entities, relationships=relationships)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--edges", type=int, default=10000, help="Relationships in the graph context")
+    parser.add_argument("--fanout", type=int, default=100, help="Relationships per source entity")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.edges, args.fanout)
+    sources = [{"id": f"doc_{i}", "content": "x" * 500, "metadata": {"source": "bench"}, "distance": 0.2} for i in range(5)]
+    service = GraphRAGService(connect_databases=False)
+    response_field = create_response_field(name="Response_process_query", type_=QueryResponse)
+    loop = asyncio.new_event_loop()
+
+    def pydantic_path():
+        context = pydantic_context(rows)
+        response = QueryResponse(answer="answer", sources=sources, graph_context=context.dict(),
+                                 confidence_score=0.9, processing_time=0.1)
+        content = loop.run_until_complete(serialize_response(field=response_field, response_content=response))
+        return JSONResponse(content).body
+
+    def records_path():
+        context = service._build_graph_context(rows)
+        result = QueryResult(answer="answer", sources=sources, graph_context=context,
+                             confidence_score=0.9, processing_time=0.1)
+        return ORJSONResponse(result.to_dict()).body
+
+    timings = {}
+    sizes = {}
+    for name, path in (("pydantic", pydantic_path), ("records", records_path)):
+        path()  # warmup
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = path()
+            latencies.append(time.perf_counter() - start)
+        timings[name] = latencies
+        sizes[name] = len(body)
+
+    rows_table = {name: {**latency_summary(latencies), "body_kb": sizes[name] / 1024} for name, latencies in timings.items()}
+    print_table(f"Response path, {len(rows)} edges ({args.repeat} runs)", rows_table)
+    speedup = rows_table["pydantic"]["p50_ms"] / max(rows_table["records"]["p50_ms"], 1e-9)
+    print(f"\nrecords + orjson is {speedup:.1f}x faster at p50")
+
+
+if __name__ == "__main__":
+    main()
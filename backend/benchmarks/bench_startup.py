@@ -0,0 +1,118 @@
+"""
+Measure API cold-start: import cost and time-to-ready.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+reports the slowest top-level imports, then starts uvicorn --runs times and
+measures how long it takes until the server accepts connections and until
+/ready returns 200 (both stores connected). Heavy model libraries (torch,
+sentence-transformers, spaCy, openai) should not appear in the import
+report; they load on the first request that needs them.
+
+Usage (from backend/, with the databases reachable):
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --imports-only --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from .common import latency_summary, print_table
+
+
+def import_profile(module: str):
+    """Return (total_seconds, {package: cumulative_seconds}) for importing a module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.getcwd()
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    packages = {}
+    total = 0
+    # Lines look like "import time:       self [us] |  cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level imports are not indented; their cumulative time includes their children
+        if name.startswith(" ") and not name.startswith("  "):
+            package = name.strip().split(".")[0]
+            packages[package] = packages.get(package, 0) + int(cumulative) / 1e6
+            total += int(cumulative) / 1e6
+    return total, packages
+
+
+def wait_for(url: str, process: subprocess.Popen, timeout: float, ready_status: int = 200):
+    """Poll url until it answers (any status) and until it answers ready_status"""
+    start = time.perf_counter()
+    listening = None
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.02)
+            continue
+        if listening is None:
+            listening = time.perf_counter() - start
+        if status == ready_status:
+            return listening, time.perf_counter() - start
+        time.sleep(0.02)
+    raise SystemExit(f"{url} not ready within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main", help="Module whose import is profiled")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to show")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for readiness per run")
+    parser.add_argument("--imports-only", action="store_true", help="Only profile imports")
+    args = parser.parse_args()
+
+    total, packages = import_profile(args.module)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    print_table(
+        f"import {args.module}: {total:.3f}s total (-X importtime, cumulative per top-level package)",
+        {name: {"seconds": seconds} for name, seconds in slowest}
+    )
+    heavy = sorted({"torch", "sentence_transformers", "spacy", "openai"} & set(packages))
+    if heavy:
+        print(f"\nWARNING: heavy libraries imported at startup: {', '.join(heavy)}")
+
+    if args.imports_only:
+        return
+
+    listening, ready = [], []
+    for _ in range(args.runs):
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            up, ok = wait_for(f"http://127.0.0.1:{args.port}/ready", process, args.timeout)
+            listening.append(up)
+            ready.append(ok)
+        finally:
+            process.terminate()
+            process.wait()
+
+    print_table(
+        f"Cold start over {args.runs} runs",
+        {"time-to-listen": latency_summary(listening), "time-to-ready": latency_summary(ready)}
+    )
+
+
+if __name__ == "__main__":
+    main()
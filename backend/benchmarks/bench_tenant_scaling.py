@@ -0,0 +1,72 @@
+"""
+Query latency as total corpus size grows while per-tenant size stays fixed.
+
+Compares two layouts in a scratch ChromaDB directory with synthetic embeddings:
+- shared: every tenant in one collection, filtered with a tenant_id where clause
+- scoped: one collection per tenant, as routed by ChromaDBManager
+
+Usage (from backend/, no external services needed):
+
+    python -m benchmarks.bench_tenant_scaling --per-tenant 2000 --tenants 1 5 25
+"""
+import argparse
+import random
+import tempfile
+
+from app.utils.config import settings
+from app.utils.database import ChromaDBManager
+from .common import timed, latency_summary, print_table
+
+
+def random_vectors(rng: random.Random, count: int, dim: int):
+    """Random Gaussian embeddings"""
+    return [[rng.gauss(0.0, 1.0) for _ in range(dim)] for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--per-tenant", type=int, default=2000, help="Documents per tenant")
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 5, 25], help="Tenant counts to measure")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per layout")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    settings.CHROMA_PERSIST_DIRECTORY = tempfile.mkdtemp(prefix="bench_tenants_")
+    manager = ChromaDBManager()
+    shared = manager.collection
+
+    rows = {}
+    loaded_tenants = 0
+    for tenant_count in sorted(args.tenants):
+        # Grow the corpus by adding whole tenants; each tenant's size never changes
+        for t in range(loaded_tenants, tenant_count):
+            tenant_id = f"tenant-{t}"
+            ids = [f"{tenant_id}-{i}" for i in range(args.per_tenant)]
+            embeddings = random_vectors(rng, args.per_tenant, args.dim)
+            metadatas = [{"tenant_id": tenant_id} for _ in ids]
+            for start in range(0, len(ids), 1000):
+                chunk = slice(start, start + 1000)
+                shared.add(ids=ids[chunk], embeddings=embeddings[chunk], metadatas=metadatas[chunk])
+                manager.get_collection(tenant_id).add(ids=ids[chunk], embeddings=embeddings[chunk])
+        loaded_tenants = tenant_count
+
+        queries = random_vectors(rng, args.queries, args.dim)
+        target = f"tenant-{tenant_count - 1}"
+        shared_latencies, scoped_latencies = [], []
+        for query in queries:
+            _, elapsed = timed(shared.query, query_embeddings=[query], n_results=args.k, where={"tenant_id": target})
+            shared_latencies.append(elapsed)
+            _, elapsed = timed(manager.get_collection(target).query, query_embeddings=[query], n_results=args.k)
+            scoped_latencies.append(elapsed)
+
+        total = tenant_count * args.per_tenant
+        rows[f"shared+where  total={total}"] = latency_summary(shared_latencies)
+        rows[f"per-tenant    total={total}"] = latency_summary(scoped_latencies)
+
+    print_table(f"Query latency, {args.per_tenant} docs per tenant", rows)
+
+
+if __name__ == "__main__":
+    main()
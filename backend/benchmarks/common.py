@@ -0,0 +1,50 @@
+import json
+import time
+import statistics
+from typing import List, Dict, Any, Callable, Iterator
+
+
+def load_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield one JSON object per non-empty line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def timed(fn: Callable, *args, **kwargs):
+    """Call fn and return (result, elapsed_seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Mean/p50/p95/p99 latency in milliseconds"""
+    return {
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]):
+    """Print a {row_name: {metric: value}} mapping as an aligned table"""
+    print(f"\n{title}")
+    if not rows:
+        return
+    metrics = list(next(iter(rows.values())).keys())
+    name_width = max(len(name) for name in rows) + 2
+    print("".ljust(name_width) + "".join(m.rjust(14) for m in metrics))
+    for name, values in rows.items():
+        print(name.ljust(name_width) + "".join(f"{values[m]:14.3f}" for m in metrics))
@@ -4,6 +4,9 @@ export interface QueryRequest {
   query: string;
   max_results?: number;
   include_graph_context?: boolean;
+  filters?: Record<string, unknown>;
+  tenant_id?: string;
+  mode?: 'auto' | 'local' | 'global';
 }
 
 export interface QueryResponse {
@@ -12,6 +15,7 @@ export interface QueryResponse {
   graph_context?: GraphContext;
   confidence_score: number;
   processing_time: number;
+  queue_time?: number;
 }
 
 export interface Source {